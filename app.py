@@ -1,59 +1,100 @@
 import chainlit as cl
-from src.helper import *
-from store_index import *
-from src.prompt import RAG_PROMPT, ORDER_SUMMARY_PROMPT, TWILIO_NOTIFICATION_PROMPT 
-from datetime import datetime
-from langchain_groq import ChatGroq
-from langchain.chains import RetrievalQA
-from langchain_classic.chains import create_retrieval_chain
-from langchain_classic.chains.combine_documents import create_stuff_documents_chain
+from dotenv import load_dotenv
+
+# Before the handlers below read their settings from the environment
+load_dotenv()
+
 from src.order_manager import order_manager
-from src.payment_handler import payment_handler
-from langchain_huggingface import HuggingFaceEmbeddings
-from pinecone.grpc import PineconeGRPC as Pinecone
-from langchain_pinecone import PineconeVectorStore
-import json
-import os
+from src.checkout_pipeline import StageFailed
+from src.notification_outbox import notification_outbox
+from src.resources import resource_registry
+from src.semantic_cache import semantic_cache
+from src.rag import retrieval_answer, stream_answer
+from src.admission import GENERATE, REJECT, RETRIEVAL, admission
+from src.llm_pool import SlotTimeout
+from src.conversation_memory import ConversationMemory, is_follow_up
+from src.session_manager import session_manager
+from src.menu_catalog import DEFAULT_PRICE, GENERIC_WORDS, describe_items, normalize
+from src.session_store import session_backend, snapshot, restore
+from src.tracing import bind, metrics, span
+from src.payment_webhook import SIGNATURE_HEADER, PaystackWebhook
+from chainlit.context import init_ws_context
+from chainlit.server import app as server_app, sio
+from chainlit.session import WebsocketSession
+from chainlit.user_session import user_sessions
+from fastapi import Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+import threading
+import asyncio
+
+
+
+@cl.on_app_startup
+def warm_up():
+    # Load and warm the shared resources in the background once the server is up (not on
+    # import); the first session to arrive before this finishes waits on the registry lock
+    threading.Thread(target=resource_registry.warm_up, daemon=True).start()
+
+
+def add_route(path, endpoint, methods):
+    """Register a route on Chainlit's server ahead of its catch-all frontend route"""
+    server_app.add_api_route(path, endpoint, methods=methods)
+    server_app.router.routes.insert(0, server_app.router.routes.pop())
+
+async def metrics_endpoint():
+    """Latency histograms, error counters and gauges in Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
+add_route("/metrics", metrics_endpoint, ["GET"])
 
+async def complete_paid_order(reference, verification, order_data):
+    """Confirm an order paid by webhook, and tell the customer if their chat is open on this worker"""
+    session = WebsocketSession.get_by_id(order_data.get("session_id") or "")
+    if session is None:
+        # They'll see it confirmed when they next verify or come back
+        await order_manager.complete_order(reference, verification, order_data)
+        return
+    
+    # Runs in its own task, so this only binds the customer's session here
+    init_ws_context(session)
+    # An idle session may have been compacted; restore it first, or saving below would
+    # replace its snapshot with the stripped state
+    await touch_session()
+    await order_manager.complete_order(reference, verification, order_data, cl.user_session)
+    cl.user_session.set("order_stage", "welcome")
+    await save_session_state()
+
+paystack_webhook = PaystackWebhook(order_manager, on_paid=complete_paid_order)
+
+async def paystack_webhook_endpoint(request: Request):
+    """Paystack posts charge events here; set it as the webhook URL in the dashboard"""
+    status_code, body = await paystack_webhook.handle(await request.body(), request.headers.get(SIGNATURE_HEADER))
+    return JSONResponse(body, status_code=status_code)
 
-# Initialize Pinecone
-PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
-pc = Pinecone(api_key=PINECONE_API_KEY)
+add_route("/paystack/webhook", paystack_webhook_endpoint, ["POST"])
 
 @cl.on_chat_start
 async def start():
-    embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-    index_name = "dashdishorderbot"
-    
-    # Connect to existing Pinecone index
-    docsearch = PineconeVectorStore.from_existing_index(
-        index_name=index_name,
-        embedding=embeddings
-    )
-
-    # Initialize LLM
-    llm = ChatGroq(
-        groq_api_key=os.getenv("GROQ_API_KEY"),
-        model_name="llama-3.1-70b-versatile",
-        temperature=0.4,
-        streaming=True
-    )
-    
-    # Create RAG chain
-    qa_chain = RetrievalQA.from_chain_type(
-        llm=llm,
-        chain_type="stuff",
-        retriever=docsearch.as_retriever(search_kwargs={"k": 3}),
-        chain_type_kwargs={"prompt": RAG_PROMPT},
-        return_source_documents=True
-    )
+    # Embeddings, vector store, LLM and RAG chain are shared process-wide
+    resources = resource_registry.acquire(cl.user_session.get("id"))
+    qa_chain = await asyncio.to_thread(resource_registry.get_qa_chain)
+    
+    # Idempotent; resumes notifications left pending by a previous run
+    await notification_outbox.start()
     
     # Initialize session
+    cl.user_session.set("resources", resources)
     cl.user_session.set("qa_chain", qa_chain)
     cl.user_session.set("order_cart", [])
     cl.user_session.set("customer_info", {})
     cl.user_session.set("order_stage", "welcome")
+    cl.user_session.set("memory", ConversationMemory())
+    await track_session()
+    
+    # Pick up an order flow left on another worker or before a restart
+    if await restore_session_state() and cl.user_session.get("order_stage") != "welcome":
+        await cl.Message(content="👋 **Welcome back!** Your cart and order details are just as you left them.").send()
+        return
     
     await cl.Message(content="""🍽️ **Welcome to DishDash OrderBot!** 🍽️
 
@@ -66,52 +107,291 @@ I can help you:
 What would you like to do today?""").send()
 
 
-async def handle_menu_query(message: cl.Message):
+@cl.on_chat_resume
+async def resume(thread):
+    resources = resource_registry.acquire(cl.user_session.get("id"))
+    cl.user_session.set("resources", resources)
+    cl.user_session.set("qa_chain", await asyncio.to_thread(resource_registry.get_qa_chain))
+    cl.user_session.set("memory", ConversationMemory())
+    await track_session()
+    await restore_session_state()
+
+
+@cl.on_chat_end
+async def end():
+    session_manager.unregister(cl.user_session.get("id"))
+    resources = cl.user_session.get("resources")
+    if resources:
+        resources.release()
+    memory = cl.user_session.get("memory")
+    if memory:
+        await memory.aclose()
+
+
+async def track_session():
+    """Hand the session to the session manager, which compacts it when idle and evicts it when long idle"""
+    session_id = cl.user_session.get("id")
+    
+    async def disconnect():
+        session = WebsocketSession.get_by_id(session_id)
+        if session is not None:
+            # Drop Chainlit's copy straight away instead of after its reconnect grace period
+            session.to_clear = True
+            await sio.disconnect(session.socket_id)
+    
+    await session_manager.register(session_id, session_key(), user_sessions[session_id], close=disconnect)
+
+async def touch_session():
+    """Note activity, bringing back an order flow the session manager compacted while idle"""
+    if session_manager.touch(cl.user_session.get("id")):
+        cl.user_session.set("memory", ConversationMemory())
+        await restore_session_state()
+
+
+def session_key():
+    """Conversation key that stays the same when the client reconnects to another worker"""
+    return getattr(cl.context.session, "thread_id", None) or cl.user_session.get("id")
+
+async def save_session_state():
+    await asyncio.to_thread(session_backend.save, session_key(), snapshot(cl.user_session))
+
+async def restore_session_state():
+    state = await asyncio.to_thread(session_backend.load, session_key())
+    return restore(cl.user_session, state, order_manager.get_order)
+
+
+async def embed_query(text):
+    embeddings = resource_registry.get_embeddings()
+    return await asyncio.to_thread(embeddings.embed_query, text)
+
+# Answers waiting on an embedding before they go into the semantic cache
+_cache_writes = set()
+
+async def cache_answer(question, answer):
+    try:
+        semantic_cache.store(question, await embed_query(question), answer)
+    except Exception as e:
+        print(f"Caching answer failed: {e}")
+
+BUSY_MESSAGE = "⏳ I'm getting a lot of questions right now. Please try again in a few seconds."
+
+async def answer_query(qa_chain, question, msg, query_vector=None):
+    """Stream an answer into msg from the semantic cache, the RAG chain, or retrieval alone under load"""
+    # Earlier turns let follow-ups like "is it spicy?" resolve; the summary updates in the background
+    memory = cl.user_session.get("memory")
+    # Self-contained questions are answered without the history, so anyone can reuse the answer;
+    # one shaped by this session's earlier turns is no one else's
+    history = memory.history() if memory and memory.turns and is_follow_up(question) else None
+    shareable = history is None
+
+    cached = semantic_cache.lookup_text(question) if shareable else None
+
+    # Near-identical questions share an answer, so embed once and check the cache.
+    # Questions naming a dish outright skip the embedding; retrieval doesn't need it.
+    names_dish = bool(resource_registry.get_lexical_index().exact_dishes(question))
+    if shareable and cached is None and not names_dish:
+        if query_vector is None:
+            query_vector = await embed_query(question)
+        cached = semantic_cache.lookup(query_vector, after_text_miss=True)
+
+    # Uncached questions go through admission control: generated, retrieval-only under load, or refused
+    decision = GENERATE if cached is not None else admission.admit(session_key())
+    
+    documents = None
+    if decision == GENERATE:
+        try:
+            answer = await stream_answer(
+                qa_chain,
+                question,
+                msg.stream_token,
+                cached=cached,
+                callbacks=[cl.AsyncLangchainCallbackHandler()],
+                history=history,
+                queue_timeout=admission.queue_deadline
+            )
+        except SlotTimeout as e:
+            # Nothing has been streamed yet, so the cheaper answer can still take its place
+            decision = admission.degrade("deadline")
+            documents = getattr(e, "documents", None)
+    
+    if decision == REJECT:
+        await msg.stream_token(BUSY_MESSAGE)
+        return BUSY_MESSAGE
+    if decision == RETRIEVAL:
+        # Not generated, so not worth caching or remembering
+        with admission.degraded():
+            return await retrieval_answer(qa_chain, question, msg.stream_token, documents)
+    
+    if memory:
+        memory.add_turn(question, answer)
+    if shareable and cached is None:
+        if query_vector is not None:
+            semantic_cache.store(question, query_vector, answer)
+        else:
+            # A question naming a dish skipped the embedding; don't hold up the reply for it
+            task = asyncio.create_task(cache_answer(question, answer))
+            _cache_writes.add(task)
+            task.add_done_callback(_cache_writes.discard)
+    return answer
+
+async def handle_menu_query(message: cl.Message, query_vector=None):
     """Handle dish recommendations using RAG"""
     qa_chain = cl.user_session.get("qa_chain")
     msg = cl.Message(content="")
     await msg.send()
     
-    # Use RAG to get dish recommendations
-    res = await qa_chain.acall(
-        message.content,
-        callbacks=[cl.AsyncLangchainCallbackHandler()]
-    )
-    
-    answer = res["result"]
-    response = f"{answer}\n\nWould you like to order any of these dishes? Just tell me what you'd like!"
-    await cl.Message(content=response).send()
+    # Use RAG to get dish recommendations, streamed into the message as it's generated
+    answer = await answer_query(qa_chain, message.content, msg, query_vector)
+    if answer != BUSY_MESSAGE:
+        await msg.stream_token("\n\nWould you like to order any of these dishes? Just tell me what you'd like!")
+    await msg.update()
 
-async def handle_general_query(message: cl.Message):
+async def handle_general_query(message: cl.Message, query_vector=None):
     """Handle general questions using RAG"""
     qa_chain = cl.user_session.get("qa_chain")
     msg = cl.Message(content="")
     await msg.send()
     
-    res = await qa_chain.acall(
-        message.content,
-        callbacks=[cl.AsyncLangchainCallbackHandler()]
-    )
-    
-    await cl.Message(content=res["result"]).send()
+    await answer_query(qa_chain, message.content, msg, query_vector)
+    await msg.update()
 
 @cl.on_message
 async def handle_message(message: cl.Message):
-    user_input = message.content.lower()
+    await touch_session()
     current_stage = cl.user_session.get("order_stage", "welcome")
+    bind(session_id=session_key())
+    
+    try:
+        with span("handle_message"):
+            if current_stage == "collecting_phone":
+                await handle_phone_input(message)
+            elif current_stage == "collecting_location":
+                await handle_location_input(message)
+            elif current_stage == "collecting_instructions":
+                await handle_instructions_input(message)
+            else:
+                await route_message(message)
+    finally:
+        # Any worker can now continue this conversation
+        await save_session_state()
+
+async def route_message(message: cl.Message):
+    """Route by intent locally; only menu browsing and questions reach the LLM"""
+    with span("routing"):
+        router = resource_registry.get_intent_router()
+        route = router.route(message.content)
+        
+        # No keyword matched: a question naming a dish is answered straight from the lexical
+        # index; otherwise embed once, use it for the centroid match and reuse it for RAG
+        query_vector = None
+        if route.source == "default" and not resource_registry.get_lexical_index().exact_dishes(message.content):
+            query_vector = await embed_query(message.content)
+            route = router.route(message.content, query_vector)
     
-    if current_stage == "collecting_phone":
-        await handle_phone_input(message)
-    elif current_stage == "collecting_location":
-        await handle_location_input(message)
-    elif current_stage == "collecting_instructions":
-        await handle_instructions_input(message)
-    elif any(keyword in user_input for keyword in ['order', 'buy', 'cart']):
+    if route.intent == "menu":
+        await handle_menu_query(message, query_vector)
+    elif route.intent == "question":
+        await handle_general_query(message, query_vector)
+    else:
+        await INTENT_HANDLERS[route.intent](message)
+
+async def handle_greeting(message: cl.Message):
+    await cl.Message(content="👋 Hello! Ask me about our Nigerian dishes, or tell me what you'd like to order.").send()
+
+async def handle_thanks(message: cl.Message):
+    await cl.Message(content="You're welcome! 😊 Anything else I can get you?").send()
+
+async def handle_cart_add(message: cl.Message):
+    """Match the dishes named in the message against the menu and add them to the cart"""
+    names = order_manager.parse_items(message.content)
+    if not names:
         await start_order_process()
-    elif any(keyword in user_input for keyword in ['menu', 'dishes', 'what do you have']):
-        await handle_menu_query(message)  
+        return
+    
+    catalog = resource_registry.get_menu_catalog()
+    if len(catalog):
+        items, unmatched = catalog.resolve_parts(names)
     else:
-        await handle_general_query(message)  
+        # No catalog built yet; take the names as typed at the default price
+        items = [{"name": name, "quantity": 1, "unit_price": DEFAULT_PRICE} for name in names]
+        unmatched = []
+    
+    if items:
+        cart = cl.user_session.get("order_cart", [])
+        cart.extend(items)
+        cl.user_session.set("order_cart", cart)
+        content = f"🛒 Added to your cart: {describe_items(items)}"
+        if unmatched:
+            content += f"\n\n❓ I couldn't find these on our menu: {', '.join(unmatched)}"
+        content += "\n\nAdd more dishes or type 'checkout' when you're ready to pay."
+    else:
+        content = f"❓ I couldn't find {', '.join(unmatched)} on our menu. Ask me what we have!"
+    await cl.Message(content=content).send()
+
+def _names_item(text, item):
+    """True if the message names the cart item, e.g. 'remove the egusi' for Egusi Soup"""
+    name = normalize(item if isinstance(item, str) else item["name"])
+    words = set(normalize(text).split())
+    specific = [word for word in name.split() if word not in GENERIC_WORDS]
+    return name in normalize(text) or bool(specific) and all(word in words for word in specific)
+
+async def handle_cart_view(message: cl.Message):
+    cart = cl.user_session.get("order_cart", [])
+    if not cart:
+        await cl.Message(content="🛒 Your cart is empty. Tell me what you'd like to order!").send()
+        return
+    lines = "\n".join(f"• {describe_items([item])}" for item in cart)
+    total = order_manager.calculate_total(cart)
+    await cl.Message(content=f"🛒 **Your cart:**\n{lines}\n\n💰 **Total:** ₦{total:,}").send()
+
+async def handle_cart_remove(message: cl.Message):
+    """Remove named dishes from the cart, or empty it"""
+    cart = cl.user_session.get("order_cart", [])
+    text = message.content.lower()
+    if any(word in text for word in ("clear", "empty")):
+        removed, cart = cart, []
+    else:
+        removed = [item for item in cart if _names_item(text, item)]
+        cart = [item for item in cart if item not in removed]
+    cl.user_session.set("order_cart", cart)
+    
+    if removed:
+        await cl.Message(content=f"🗑️ Removed: {describe_items(removed)}").send()
+    else:
+        await cl.Message(content="I couldn't find that in your cart.").send()
+    await handle_cart_view(message)
+
+async def handle_checkout(message: cl.Message):
+    """Create the order from the cart and start payment"""
+    cart = cl.user_session.get("order_cart", [])
+    if not cart:
+        await cl.Message(content="🛒 Your cart is empty. Tell me what you'd like to order first!").send()
+        return
+    
+    customer_info = cl.user_session.get("customer_info", {})
+    if not customer_info.get("phone") or not customer_info.get("location"):
+        await start_order_process()
+        return
+    
+    order_data = await order_manager.create_order(cl.user_session, cart, customer_info)
+    await order_manager.process_payment(order_data, cl.user_session)
+
+async def handle_order_status(message: cl.Message):
+    current_order = cl.user_session.get("current_order")
+    if not current_order:
+        await cl.Message(content="You don't have an active order yet.").send()
+        return
+    await cl.Message(content=f"📦 Order **{current_order['order_id']}** is **{current_order['status']}**.").send()
+
+INTENT_HANDLERS = {
+    "greeting": handle_greeting,
+    "thanks": handle_thanks,
+    "cart_add": handle_cart_add,
+    "cart_view": handle_cart_view,
+    "cart_remove": handle_cart_remove,
+    "checkout": handle_checkout,
+    "order_status": handle_order_status,
+}
 
 async def start_order_process():
     """Start the order collection process"""
@@ -156,6 +436,7 @@ What would you like to do?""").send()
 @cl.action_callback("pay_now")
 async def on_pay_now(action: cl.Action):
     """Handle pay now action"""
+    await touch_session()
     reference = action.value
     # In a real app, you'd open the payment URL
     await cl.Message(content=f"Please visit the payment URL to complete your transaction. Reference: {reference}").send()
@@ -163,11 +444,21 @@ async def on_pay_now(action: cl.Action):
 @cl.action_callback("verify_payment")
 async def on_verify_payment(action: cl.Action):
     """Handle payment verification"""
+    await touch_session()
     reference = action.value
-    success = await order_manager.verify_and_complete_order(reference, cl.user_session)
+    try:
+        success = await order_manager.verify_and_complete_order(reference, cl.user_session)
+    except StageFailed as e:
+        # Paid but not confirmed; the cart is kept and the claim released, so verifying again can finish it
+        print(f"Completing order for {reference} failed: {e}")
+        await cl.Message(
+            content="⚠️ Your payment went through, but we couldn't confirm your order just now. Please tap Verify Payment again in a moment."
+        ).send()
+        return
     
     if success:
         cl.user_session.set("order_stage", "welcome")
+        await save_session_state()
     else:
         await cl.Message(content="Payment verification failed. Please try again or contact support.").send()
 
@@ -0,0 +1,289 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+
+# Drives scripted customer conversations through app.py's handlers, concurrently,
+# against the local stand-ins in stand_ins.py instead of Groq, Pinecone, Paystack
+# and Twilio. Run `python load_test.py --sessions 200` and compare the saved JSON
+# between runs with --baseline.
+
+DISHES = [
+    ("Jollof Rice", "rice, tomatoes, peppers, onions", "Rice", "West", "Affordable"),
+    ("Egusi Soup", "melon seeds, spinach, palm oil, stockfish", "Soup", "South East", "Moderate"),
+    ("Efo Riro", "spinach, palm oil, locust beans, peppers", "Soup", "South West", "Moderate"),
+    ("Pounded Yam", "yam", "Swallow", "South West", "Affordable"),
+    ("Pepper Soup", "goat meat, uziza, scent leaves, peppers", "Soup", "South South", "Moderate"),
+    ("Suya", "beef, groundnut spice, onions", "Snack", "North", "Affordable"),
+    ("Moi Moi", "beans, peppers, onions, palm oil", "Side", "South West", "Affordable"),
+    ("Afang Soup", "afang leaves, waterleaf, periwinkle, palm oil", "Soup", "South South", "Expensive"),
+]
+
+MENU_QUESTIONS = [
+    "Can you recommend some soups?",
+    "What dishes do you have for lunch?",
+    "Recommend something spicy",
+    "What's on the menu today?",
+    "Suggest a light meal",
+]
+
+GENERAL_QUESTIONS = [
+    "What is Egusi Soup made of?",
+    "Is Afang Soup healthy?",
+    "Which region is Suya from?",
+]
+
+# (stage, kind, input); message inputs are formatted with the conversation number
+SCRIPT = [
+    ("menu_question", "message", None),
+    ("general_question", "message", None),
+    ("cart_add", "message", "add 2 jollof rice and egusi soup"),
+    ("start_checkout", "message", "checkout"),
+    ("phone", "message", "0803{i:07d}"),
+    ("location", "message", "{i} Allen Avenue, Ikeja"),
+    ("instructions", "message", "extra spicy please"),
+    ("checkout", "message", "checkout"),
+    ("pay_now", "action", "pay_now"),
+    ("verify_payment", "action", "verify_payment"),
+]
+
+
+class ScriptedAction:
+    """What an action callback reads off the button the customer clicked"""
+
+    def __init__(self, name, value):
+        self.name = name
+        self.value = value
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+
+    def at(fraction):
+        return round(ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))] * 1000, 3)
+
+    return {
+        "count": len(ordered),
+        "p50_ms": at(0.50),
+        "p95_ms": at(0.95),
+        "p99_ms": at(0.99),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+    }
+
+
+def prepare_environment(args, workdir, urls):
+    """Point every store and external service at the work directory and the stand-ins"""
+    os.environ.update({
+        "VECTOR_BACKEND": "local",
+        "EMBEDDING_CACHE": "off",
+        "LOCAL_INDEX_DIR": os.path.join(workdir, "local_index"),
+        "MENU_CATALOG_PATH": os.path.join(workdir, "menu_catalog.json"),
+        "LEXICAL_INDEX_PATH": os.path.join(workdir, "lexical_index.json"),
+        "INDEX_VERSION_FILE": os.path.join(workdir, "index_version"),
+        "ORDER_DB_PATH": os.path.join(workdir, "orders.db"),
+        "SESSION_DB_PATH": os.path.join(workdir, "sessions.db"),
+        "OUTBOX_DB_PATH": os.path.join(workdir, "outbox.db"),
+        "GROQ_API_BASE": urls["llm"],
+        "GROQ_API_KEY": "load-test",
+        "PINECONE_API_KEY": "load-test",
+        "PAYSTACK_BASE_URL": urls["paystack"],
+        "PAYSTACK_SECRET_KEY": "sk_test_load",
+        "TWILIO_ACCOUNT_SID": "ACloadtest",
+        "TWILIO_AUTH_TOKEN": "load-test",
+        "TWILIO_WHATSAPP_FROM": "whatsapp:+10000000000",
+        "OWNER_PHONE_NUMBER": "whatsapp:+10000000001",
+    })
+    os.environ["ADMISSION_CONTROL"] = args.admission
+    os.environ["LLM_MAX_IN_FLIGHT"] = str(args.llm_max_in_flight)
+    if not args.semantic_cache:
+        os.environ["SEMANTIC_CACHE_MAX_ENTRIES"] = "1"
+        os.environ["SEMANTIC_CACHE_THRESHOLD"] = "2"
+
+    from src.ingestion import content_hash, dish_text
+    from src.lexical_index import LexicalIndex
+    from src.menu_catalog import MenuCatalog
+    from stand_ins import DelayedVectorStore, FakeEmbeddings
+
+    rows = []
+    for name, ingredients, food_class, region, price_range in DISHES:
+        row = {
+            "Food_Name": name, "Main_Ingredients": ingredients, "Food_Class": food_class, "Region": region,
+            "Price_Range": price_range, "Description": f"A popular {food_class.lower()} from the {region}.",
+            "Food_Health": "A good source of energy.",
+        }
+        row["text"] = dish_text(row)
+        row["row_hash"] = content_hash(row["text"])
+        rows.append(row)
+    MenuCatalog.from_rows(rows).save(os.environ["MENU_CATALOG_PATH"])
+    LexicalIndex(rows).save(os.environ["LEXICAL_INDEX_PATH"])
+
+    embeddings = FakeEmbeddings(latency=args.embed_latency)
+    DelayedVectorStore.latency = args.vector_latency
+    DelayedVectorStore.from_texts(
+        [row["text"] for row in rows],
+        FakeEmbeddings(latency=0),
+        metadatas=[{"row_hash": row["row_hash"], "food_name": row["Food_Name"]} for row in rows],
+        path=os.environ["LOCAL_INDEX_DIR"]
+    )
+
+    # Installed before app.py is imported, so its warm-up never loads the real model
+    from src.resources import resource_registry
+    resource_registry.provide("embeddings", embeddings)
+    resource_registry.provide("vectorstore", DelayedVectorStore.load(embeddings, os.environ["LOCAL_INDEX_DIR"]))
+
+
+async def converse(app, i, timings, errors, think_time):
+    """One customer, from the first question to a verified payment"""
+    import chainlit as cl
+    from chainlit.context import init_http_context
+
+    init_http_context(thread_id=f"load-test-{i}")
+    await app.start()
+    callbacks = {"pay_now": app.on_pay_now, "verify_payment": app.on_verify_payment}
+    for stage, kind, text in SCRIPT:
+        if stage == "menu_question":
+            text = MENU_QUESTIONS[i % len(MENU_QUESTIONS)]
+        elif stage == "general_question":
+            text = GENERAL_QUESTIONS[i % len(GENERAL_QUESTIONS)]
+
+        started = time.perf_counter()
+        try:
+            if kind == "message":
+                await app.handle_message(cl.Message(content=text.format(i=i)))
+            else:
+                await callbacks[text](ScriptedAction(text, cl.user_session.get("payment_reference")))
+        except Exception as e:
+            errors[stage].append(f"{type(e).__name__}: {e}")
+        timings[stage].append(time.perf_counter() - started)
+
+        if think_time:
+            await asyncio.sleep(random.uniform(0, 2 * think_time))
+    await app.end()
+    current_order = cl.user_session.get("current_order")
+    return current_order["order_id"] if current_order else None
+
+
+async def run_load(app, args):
+    from src.admission import admission
+    from src.notification_outbox import notification_outbox
+    from src.rag import answer_metrics
+
+    timings, errors = defaultdict(list), defaultdict(list)
+    started = time.perf_counter()
+    order_ids = await asyncio.gather(*(
+        converse(app, i, timings, errors, args.think_time) for i in range(args.sessions)
+    ))
+    elapsed = time.perf_counter() - started
+
+    drain_started = time.perf_counter()
+    await notification_outbox.drain()
+    drain_seconds = time.perf_counter() - drain_started
+
+    confirmed = 0
+    for order_id in order_ids:
+        order = app.order_manager.get_order(order_id) if order_id else None
+        confirmed += bool(order and order.get("status") == "confirmed")
+
+    turns = sum(len(samples) for samples in timings.values())
+    return {
+        "elapsed_seconds": round(elapsed, 3),
+        "conversations_per_second": round(args.sessions / elapsed, 2),
+        "turns_per_second": round(turns / elapsed, 2),
+        "orders_confirmed": confirmed,
+        "notification_drain_seconds": round(drain_seconds, 3),
+        "stages": {
+            stage: {**percentiles(timings[stage]), "errors": len(errors[stage]), "first_error": (errors[stage] or [None])[0]}
+            for stage, _, _ in SCRIPT
+        },
+        "outbox": notification_outbox.stats(),
+        "admission": admission.stats(),
+        "answers": answer_metrics.stats(),
+    }
+
+
+def compare(results, baseline_path):
+    """Per-stage p95 change against an earlier run"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    changes = {}
+    for stage, stats in results["stages"].items():
+        before = baseline.get("stages", {}).get(stage)
+        if before and before["p95_ms"]:
+            changes[stage] = {
+                "p95_ms_before": before["p95_ms"],
+                "p95_ms_after": stats["p95_ms"],
+                "change": round(stats["p95_ms"] / before["p95_ms"] - 1, 3),
+            }
+    changes["turns_per_second"] = {
+        "before": baseline.get("turns_per_second"),
+        "after": results["turns_per_second"],
+    }
+    return changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent end-to-end conversations against local stand-ins")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean pause between a customer's turns, seconds")
+    parser.add_argument("--llm-ttft", type=float, default=0.3)
+    parser.add_argument("--llm-token-delay", type=float, default=0.01)
+    parser.add_argument("--embed-latency", type=float, default=0.01)
+    parser.add_argument("--vector-latency", type=float, default=0.05)
+    parser.add_argument("--paystack-latency", type=float, default=0.2)
+    parser.add_argument("--twilio-latency", type=float, default=0.1)
+    parser.add_argument("--llm-max-in-flight", type=int, default=8, help="concurrent LLM calls the pool allows")
+    parser.add_argument("--admission", choices=["on", "off"], default="on",
+                        help="admission control in front of the LLM (compare p99 with a slow --llm-ttft)")
+    parser.add_argument("--semantic-cache", action="store_true", help="let repeated questions hit the semantic cache")
+    parser.add_argument("--output", default=None, help="results file (default artifacts/load_tests/<timestamp>.json)")
+    parser.add_argument("--baseline", default=None, help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    from stand_ins import BackgroundServer, create_llm_app, create_paystack_app, create_twilio_app
+
+    llm_app = create_llm_app(ttft=args.llm_ttft, token_delay=args.llm_token_delay)
+    paystack_app = create_paystack_app(latency=args.paystack_latency)
+    twilio_app = create_twilio_app(latency=args.twilio_latency)
+
+    with tempfile.TemporaryDirectory() as workdir, \
+            BackgroundServer(llm_app) as llm, \
+            BackgroundServer(paystack_app) as paystack, \
+            BackgroundServer(twilio_app) as twilio:
+        prepare_environment(args, workdir, {"llm": llm.url, "paystack": paystack.url})
+
+        import app
+        from twilio.rest import Client
+        from src.payment_handler import payment_handler
+        from stand_ins import twilio_http_client
+        payment_handler.twilio_client = Client(
+            os.environ["TWILIO_ACCOUNT_SID"], os.environ["TWILIO_AUTH_TOKEN"], http_client=twilio_http_client(twilio.url)
+        )
+
+        results = asyncio.run(run_load(app, args))
+        results["config"] = vars(args)
+        results["stand_in_calls"] = {
+            "llm": llm_app.state.calls,
+            "paystack": paystack_app.state.calls,
+            "twilio_messages": len(twilio_app.state.messages),
+        }
+        app.order_manager.orders.close()
+
+    if args.baseline:
+        results["baseline_comparison"] = compare(results, args.baseline)
+
+    output = args.output or os.path.join("artifacts", "load_tests", f"{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"Saved results to {output}")
+
+
+if __name__ == "__main__":
+    main()
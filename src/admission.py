@@ -0,0 +1,133 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from src.llm_pool import llm_pool
+from src.tracing import metrics
+
+# Set ADMISSION_CONTROL=off to send every uncached question to the LLM, however long the queue
+ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "on")
+
+# Generated answers per second across the process, and per user
+ADMISSION_GLOBAL_RATE = float(os.getenv("ADMISSION_GLOBAL_RATE", "20"))
+ADMISSION_GLOBAL_BURST = int(os.getenv("ADMISSION_GLOBAL_BURST", "40"))
+ADMISSION_USER_RATE = float(os.getenv("ADMISSION_USER_RATE", "0.5"))
+ADMISSION_USER_BURST = int(os.getenv("ADMISSION_USER_BURST", "5"))
+# Questions allowed to wait for an LLM slot, and for how long
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "32"))
+ADMISSION_QUEUE_DEADLINE_SECONDS = float(os.getenv("ADMISSION_QUEUE_DEADLINE_SECONDS", "4"))
+# Retrieval-only answers in flight before even those are refused
+ADMISSION_MAX_DEGRADED = int(os.getenv("ADMISSION_MAX_DEGRADED", "64"))
+
+GENERATE = "generate"
+RETRIEVAL = "retrieval"
+REJECT = "reject"
+
+admission_decisions = metrics.counter("dishdash_admission_decisions_total", "LLM-backed questions by admission decision and reason")
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class AdmissionController:
+    """Decides how an uncached question is answered: generated, retrieval-only, or refused
+
+    When the user is over their own rate, the global rate is spent or the LLM
+    queue is full, the question gets a retrieval-only answer, and only once
+    those are saturated too is it refused. Admitted questions wait at most
+    queue_deadline for an LLM slot before falling back the same way.
+    """
+
+    def __init__(self, global_rate=ADMISSION_GLOBAL_RATE, global_burst=ADMISSION_GLOBAL_BURST,
+                 user_rate=ADMISSION_USER_RATE, user_burst=ADMISSION_USER_BURST, max_queue=ADMISSION_MAX_QUEUE,
+                 queue_deadline=ADMISSION_QUEUE_DEADLINE_SECONDS, max_degraded=ADMISSION_MAX_DEGRADED,
+                 enabled=ADMISSION_CONTROL != "off", max_users=10000):
+        self.enabled = enabled
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.max_queue = max_queue
+        self.queue_deadline = queue_deadline if enabled else None
+        self.max_degraded = max_degraded
+        self.max_users = max_users
+        self._global = TokenBucket(global_rate, global_burst)
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+        self.degraded_in_flight = 0
+        self._counts = {}
+
+    def _record(self, decision, reason):
+        self._counts[(decision, reason)] = self._counts.get((decision, reason), 0) + 1
+        admission_decisions.inc(decision=decision, reason=reason)
+        return decision
+
+    def _user_bucket(self, user_id):
+        bucket = self._users.get(user_id)
+        if bucket is None:
+            bucket = self._users[user_id] = TokenBucket(self.user_rate, self.user_burst)
+            if len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        self._users.move_to_end(user_id)
+        return bucket
+
+    def admit(self, user_id):
+        if not self.enabled:
+            return self._record(GENERATE, "disabled")
+        with self._lock:
+            if not self._user_bucket(user_id).take():
+                return self.degrade("user_rate")
+            if llm_pool.queued() >= self.max_queue:
+                return self.degrade("queue_full")
+            if not self._global.take():
+                return self.degrade("global_rate")
+        return self._record(GENERATE, "admitted")
+
+    def degrade(self, reason):
+        """Retrieval-only if there's room for it, else refuse"""
+        if self.degraded_in_flight >= self.max_degraded:
+            return self._record(REJECT, reason)
+        return self._record(RETRIEVAL, reason)
+
+    @contextmanager
+    def degraded(self):
+        """Count a retrieval-only answer as in flight while it is served"""
+        self.degraded_in_flight += 1
+        try:
+            yield
+        finally:
+            self.degraded_in_flight -= 1
+
+    def stats(self):
+        counts = dict(self._counts)
+        # A deadline fallback is a second decision about a question already counted as admitted
+        total = sum(count for (_, reason), count in counts.items() if reason != "deadline")
+        shed = sum(count for (decision, _), count in counts.items() if decision == REJECT)
+        degraded = sum(count for (decision, _), count in counts.items() if decision == RETRIEVAL)
+        return {
+            "decisions": {f"{decision}:{reason}": count for (decision, reason), count in sorted(counts.items())},
+            "shed_rate": round(shed / total, 4) if total else 0.0,
+            "degraded_rate": round(degraded / total, 4) if total else 0.0,
+            "queue_depth": llm_pool.queued(),
+            "degraded_in_flight": self.degraded_in_flight,
+        }
+
+
+# Global admission controller instance
+admission = AdmissionController()
+metrics.gauge("dishdash_admission_degraded_in_flight", "Retrieval-only answers being served", lambda: admission.degraded_in_flight)
@@ -0,0 +1,133 @@
+import asyncio
+import time
+
+
+class StageFailed(Exception):
+    """A required stage (or one it depends on) failed and had no fallback"""
+
+
+class Stage:
+    """One step of checkout; runs once all of its dependencies have finished
+
+    `run` is an async callable receiving the results of earlier stages by name.
+    Optional stages never hold up the pipeline: it returns as soon as the
+    required stages are done, and a failed optional stage just yields None.
+    A failed or timed-out stage with a `fallback` uses the fallback's result.
+    """
+
+    def __init__(self, name, run, depends_on=(), timeout=None, required=True, fallback=None):
+        self.name = name
+        self.run = run
+        self.depends_on = tuple(depends_on)
+        self.timeout = timeout
+        self.required = required
+        self.fallback = fallback
+
+
+class CheckoutPipeline:
+    def __init__(self, stages):
+        self.stages = {stage.name: stage for stage in stages}
+        for stage in stages:
+            missing = [dep for dep in stage.depends_on if dep not in self.stages]
+            if missing:
+                raise ValueError(f"Stage {stage.name} depends on unknown stages: {missing}")
+
+        self.last_timings = {}
+        self.last_critical_path = []
+        self._totals = {name: {"runs": 0, "failures": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+                        for name in self.stages}
+        self._background = set()
+
+    async def _run_stage(self, stage, tasks, results, timings, started):
+        for dep in stage.depends_on:
+            try:
+                await tasks[dep]
+            except Exception as e:
+                raise StageFailed(f"{stage.name} skipped: dependency {dep} failed") from e
+
+        stage_started = time.perf_counter()
+        error = None
+        try:
+            result = await asyncio.wait_for(stage.run(results), stage.timeout)
+        except Exception as e:
+            error = e
+            if stage.fallback is not None:
+                result = await stage.fallback(results)
+            elif stage.required:
+                raise StageFailed(f"{stage.name} failed: {e!r}") from e
+            else:
+                result = None
+        finally:
+            finished = time.perf_counter()
+            timings[stage.name] = {
+                "start": round(stage_started - started, 6),
+                "end": round(finished - started, 6),
+                "seconds": round(finished - stage_started, 6),
+                "error": repr(error) if error else None,
+            }
+            totals = self._totals[stage.name]
+            totals["runs"] += 1
+            totals["failures"] += error is not None
+            totals["total_seconds"] += finished - stage_started
+            totals["max_seconds"] = max(totals["max_seconds"], finished - stage_started)
+
+        results[stage.name] = result
+        return result
+
+    async def run(self, initial=None):
+        """Run all stages, returning the results once the required ones are done"""
+        results = dict(initial or {})
+        timings = {}
+        started = time.perf_counter()
+
+        tasks = {}
+        for name, stage in self.stages.items():
+            tasks[name] = asyncio.ensure_future(self._run_stage(stage, tasks, results, timings, started))
+
+        required = [tasks[name] for name, stage in self.stages.items() if stage.required]
+        optional = [tasks[name] for name, stage in self.stages.items() if not stage.required]
+
+        # Optional stages keep running after we return; hold a reference so they finish
+        for task in optional:
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
+        # Failures are reported through timings, so mark every exception as retrieved
+        for task in tasks.values():
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+        try:
+            await asyncio.gather(*required)
+        finally:
+            self.last_timings = timings
+            self.last_critical_path = self._critical_path(timings)
+        return results
+
+    def _critical_path(self, timings):
+        """Walk back from the last required stage to finish through its slowest dependency"""
+        finished = [name for name in timings if self.stages[name].required]
+        if not finished:
+            return []
+        name = max(finished, key=lambda n: timings[n]["end"])
+        path = [name]
+        while True:
+            deps = [dep for dep in self.stages[name].depends_on if dep in timings]
+            if not deps:
+                break
+            name = max(deps, key=lambda n: timings[n]["end"])
+            path.append(name)
+        return list(reversed(path))
+
+    def stats(self):
+        return {
+            "last_timings": self.last_timings,
+            "last_critical_path": self.last_critical_path,
+            "stages": {
+                name: {
+                    "runs": totals["runs"],
+                    "failures": totals["failures"],
+                    "avg_seconds": round(totals["total_seconds"] / totals["runs"], 6) if totals["runs"] else None,
+                    "max_seconds": round(totals["max_seconds"], 6),
+                }
+                for name, totals in self._totals.items()
+            },
+        }
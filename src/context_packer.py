@@ -0,0 +1,136 @@
+import os
+import re
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+RAG_CONTEXT_TOKENS = int(os.getenv("RAG_CONTEXT_TOKENS", "600"))
+
+# Field labels in the text store_index.py embeds, in order
+FIELDS = ["Food Name", "Main Ingredients", "Description", "Health Benefits", "Class", "Region"]
+FIELD_PATTERN = re.compile(r"(?:^|(?<=\. ))(" + "|".join(FIELDS) + r"): ")
+
+# Always kept; the rest only when the question asks about them
+DEFAULT_FIELDS = ["Food Name", "Main Ingredients", "Description"]
+FIELD_KEYWORDS = {
+    "Health Benefits": r"\b(health|healthy|benefits?|nutrition|nutritious|diet|calories|good for)\b",
+    "Class": r"\b(class|type|kind|category|soup|swallow|snack|stew|protein|side)\b",
+    "Region": r"\b(region|where|from|origin|state|tribe|yoruba|igbo|hausa|north|south|east|west)\b",
+}
+
+MAX_OVERLAP = 400
+
+
+def approx_tokens(text):
+    """Rough token count (about four characters per token for English text)"""
+    return (len(text) + 3) // 4
+
+
+def _strip_overlap(previous, current):
+    """Drop the start of `current` that repeats the end of `previous` (chunk overlap)"""
+    for size in range(min(len(previous), len(current), MAX_OVERLAP), 20, -1):
+        if previous.endswith(current[:size]):
+            return current[size:]
+    return current
+
+
+def _dish_key(doc, index):
+    metadata = doc.metadata or {}
+    if metadata.get("row_hash"):
+        return metadata["row_hash"]
+    if metadata.get("food_name"):
+        return metadata["food_name"]
+    match = re.match(r"Food Name: ([^.]+)\.", doc.page_content)
+    return match.group(1).strip() if match else f"chunk-{index}"
+
+
+def parse_fields(text):
+    """Split 'Food Name: X. Main Ingredients: Y. ...' into {label: value}"""
+    fields = {}
+    matches = list(FIELD_PATTERN.finditer(text))
+    if not matches:
+        return {"Description": text.strip()}
+    # A later chunk of a long row starts part-way through a field
+    leading = text[:matches[0].start()].strip()
+    if leading:
+        fields["Description"] = leading.rstrip(".")
+    for match, following in zip(matches, matches[1:] + [None]):
+        end = following.start() if following else len(text)
+        value = text[match.end():end].strip().rstrip(".")
+        fields[match.group(1)] = f"{fields[match.group(1)]} {value}" if match.group(1) in fields else value
+    return fields
+
+
+class ContextPacker:
+    """Merges retrieved chunks by dish, removes repeated spans, keeps the fields the question needs,
+    and fits the result into a token budget"""
+
+    def __init__(self, token_budget=RAG_CONTEXT_TOKENS):
+        self.token_budget = token_budget
+        self._field_patterns = {field: re.compile(pattern, re.IGNORECASE) for field, pattern in FIELD_KEYWORDS.items()}
+
+    def fields_for(self, question):
+        wanted = list(DEFAULT_FIELDS)
+        for field, pattern in self._field_patterns.items():
+            if pattern.search(question or ""):
+                wanted.append(field)
+        return wanted
+
+    def merge(self, documents):
+        """One text per dish, in order of the dish's best-ranked chunk"""
+        dishes = {}
+        for index, doc in enumerate(documents):
+            dishes.setdefault(_dish_key(doc, index), []).append(doc)
+
+        merged = []
+        for key, docs in dishes.items():
+            docs = sorted(docs, key=lambda doc: (doc.metadata or {}).get("chunk", 0))
+            text, seen = "", set()
+            for doc in docs:
+                if doc.page_content in seen or doc.page_content in text:
+                    continue
+                seen.add(doc.page_content)
+                text += _strip_overlap(text, doc.page_content) if text else doc.page_content
+            merged.append((key, text, docs[0].metadata))
+        return merged
+
+    def pack(self, documents, question=""):
+        """Packed context as one Document per dish"""
+        wanted = self.fields_for(question)
+        dishes = []
+        for key, text, metadata in self.merge(documents):
+            fields = parse_fields(text)
+            if "Food Name" not in fields and (metadata or {}).get("food_name"):
+                fields["Food Name"] = metadata["food_name"]
+            # Description goes last: it is the long field, so it is the one a tight budget trims
+            order = [field for field in FIELDS if field != "Description"] + ["Description"]
+            parts = [f"{field}: {fields[field]}." for field in order if field in wanted and fields.get(field)]
+            dishes.append((key, " ".join(parts), metadata))
+
+        # Each dish gets an equal share of what's left, so one long dish can't crowd out the rest
+        packed, remaining = [], self.token_budget
+        for position, (key, content, metadata) in enumerate(dishes):
+            share = remaining // (len(dishes) - position)
+            if approx_tokens(content) > share:
+                content = content[:share * 4]
+                cut = content.rfind(". ")
+                content = content[:cut + 1] if cut > 0 else content
+            if not content:
+                continue
+            remaining -= approx_tokens(content)
+            packed.append(Document(page_content=content, metadata={**(metadata or {}), "dish_key": key}))
+        return packed
+
+
+class PackedRetriever(BaseRetriever):
+    """Retriever that hands the prompt packed, deduplicated context instead of raw chunks"""
+
+    retriever: BaseRetriever
+    packer: ContextPacker
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        return self.packer.pack(self.retriever.invoke(query), query)
+
+    async def _aget_relevant_documents(self, query, *, run_manager=None):
+        return self.packer.pack(await self.retriever.ainvoke(query), query)
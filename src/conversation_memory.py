@@ -0,0 +1,141 @@
+import asyncio
+import os
+import re
+from collections import deque
+from src.context_packer import approx_tokens
+from src.llm_pool import llm_pool
+from src.prompt import MEMORY_SUMMARY_PROMPT
+from src.tracing import metrics
+
+# Hard budget for the history put in front of each RAG question
+MEMORY_TOKENS = int(os.getenv("MEMORY_TOKENS", "400"))
+MEMORY_SUMMARY_TOKENS = int(os.getenv("MEMORY_SUMMARY_TOKENS", "150"))
+MEMORY_RECENT_TURNS = int(os.getenv("MEMORY_RECENT_TURNS", "3"))
+# A small model of its own, so summaries never queue behind customers' answers in the LLM pool
+MEMORY_SUMMARY_MODEL = os.getenv("MEMORY_SUMMARY_MODEL", "llama-3.1-8b-instant")
+
+# Words that point back at something said earlier ("is it spicy?", "what about that one?")
+FOLLOW_UP = re.compile(
+    r"\b(it|its|that|this|these|those|them|they|their|one|ones|same|another|other|else|instead|more)\b"
+    r"|^\s*(and|but|so|also|what about|how about)\b",
+    re.IGNORECASE
+)
+# Questions this short ("price?", "how spicy?") only make sense in context
+FOLLOW_UP_MAX_WORDS = 3
+
+# Per-turn storage cap; a long answer is only ever needed in part
+MAX_TURN_CHARS = 1200
+# Turns waiting for the summarizer; beyond this the oldest are folded in without it
+MAX_PENDING_TURNS = 8
+
+history_tokens = metrics.histogram(
+    "dishdash_memory_history_tokens", "Conversation history tokens added to a RAG prompt",
+    buckets=(0, 50, 100, 200, 300, 400, 600, 800, 1200)
+)
+summaries = metrics.counter("dishdash_memory_summaries_total", "Rolling summary updates, by outcome")
+
+
+def _clip(text, limit):
+    text = " ".join((text or "").split())
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
+
+
+def format_turn(question, answer):
+    return f"Customer: {question}\nDishDash: {answer}"
+
+
+def is_follow_up(question):
+    """True if the question likely needs earlier turns to be understood"""
+    return len(question.split()) <= FOLLOW_UP_MAX_WORDS or bool(FOLLOW_UP.search(question))
+
+
+class ConversationMemory:
+    """One session's recent turns verbatim plus a rolling summary of the older ones
+
+    Turns pushed out of the recent window are summarized in a background task,
+    so answering never waits on it; until the summary catches up they are
+    simply absent from the history. Memory per session is bounded by the
+    recent window, MAX_PENDING_TURNS and the summary length.
+    """
+
+    def __init__(self, token_budget=MEMORY_TOKENS, summary_tokens=MEMORY_SUMMARY_TOKENS,
+                 recent_turns=MEMORY_RECENT_TURNS, summarize=None):
+        self.token_budget = token_budget
+        self.summary_tokens = summary_tokens
+        self.recent = deque()
+        self.recent_turns = recent_turns
+        self.summary = ""
+        self.turns = 0
+        self._pending = deque()
+        self._task = None
+        # async (summary, turns) -> new summary text
+        self.summarize = summarize or self._llm_summary
+
+    def add_turn(self, question, answer):
+        self.turns += 1
+        self.recent.append((_clip(question, MAX_TURN_CHARS // 4), _clip(answer, MAX_TURN_CHARS)))
+        while len(self.recent) > self.recent_turns:
+            self._pending.append(self.recent.popleft())
+        while len(self._pending) > MAX_PENDING_TURNS:
+            # The summarizer is behind (or failing); keep just the question
+            question, _ = self._pending.popleft()
+            self._set_summary(f"{self.summary} Asked: {question}".strip())
+        if self._pending and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._fold_pending())
+
+    def history(self):
+        """Summary plus as many of the latest turns as fit the token budget, oldest first"""
+        budget = self.token_budget
+        parts = []
+        if self.summary:
+            parts.append(f"Summary: {self.summary}")
+            budget -= approx_tokens(parts[0])
+        turns = []
+        for question, answer in reversed(self.recent):
+            turn = format_turn(question, answer)
+            cost = approx_tokens(turn)
+            if cost > budget:
+                if not turns and budget > 20:
+                    # Always keep some of the last turn; follow-ups refer to it
+                    turns.append(_clip(turn, budget * 4))
+                break
+            turns.append(turn)
+            budget -= cost
+        text = "\n".join(parts + list(reversed(turns)))
+        history_tokens.observe(approx_tokens(text))
+        return text or "None"
+
+    def size_bytes(self):
+        """Rough bytes held: the stored text of every turn and the summary"""
+        return len(self.summary) + sum(len(q) + len(a) for q, a in list(self.recent) + list(self._pending))
+
+    def _set_summary(self, text):
+        self.summary = _clip(text, self.summary_tokens * 4)
+
+    async def _fold_pending(self):
+        while self._pending:
+            batch = list(self._pending)
+            try:
+                summary = await self.summarize(self.summary, batch)
+            except Exception as e:
+                summaries.inc(outcome="failed")
+                print(f"Conversation summary failed: {e}")
+                return
+            # Turns that arrived meanwhile stay pending for the next round
+            folded = {id(turn) for turn in batch}
+            self._pending = deque(turn for turn in self._pending if id(turn) not in folded)
+            self._set_summary(summary)
+            summaries.inc(outcome="updated")
+
+    async def _llm_summary(self, summary, turns):
+        prompt = MEMORY_SUMMARY_PROMPT.format(
+            summary=summary or "None",
+            turns="\n".join(format_turn(question, answer) for question, answer in turns),
+            max_words=int(self.summary_tokens * 0.75)
+        )
+        response = await llm_pool.ainvoke(prompt, model=MEMORY_SUMMARY_MODEL, temperature=0.0)
+        return response.content
+
+    async def aclose(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
@@ -0,0 +1,261 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "artifacts/embedding_cache")
+VECTORS_FILE = "vectors.f32"
+GENERATIONS_FILE = "generations.u64"
+INDEX_FILE = "index.db"
+# Bumped when the index layout changes; a cache with another version is rebuilt
+SCHEMA_VERSION = "2"
+
+
+class EmbeddingCache:
+    """Content-hash keyed vectors in a fixed-size memory-mapped float32 file
+
+    A small SQLite (WAL) index maps each key to its slot in the file, so any
+    number of processes can read it while one at a time writes. Slots are
+    reserved, filled, then marked ready; readers only see ready slots. When the
+    file is full the least recently used slots are reused. Every write to a
+    slot bumps its generation, and an entry records the generation it was
+    written at, so a read that races a slot's reuse is discarded. Everything
+    is dropped if the cache was built with a different model.
+    """
+
+    def __init__(self, model_name, path=EMBEDDING_CACHE_DIR, max_entries=50000, touch_interval=60):
+        self.model_name = model_name
+        self.path = path
+        self.max_entries = max_entries
+        self.touch_interval = touch_interval
+        self._local = threading.local()
+        self._vectors = None
+        self._generations = None
+        self._dim = None
+
+        os.makedirs(path, exist_ok=True)
+        conn = self._connection()
+        with conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        meta = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+        if meta.get("model_name") != model_name or meta.get("schema") != SCHEMA_VERSION:
+            self._reset(conn)
+            return
+        if int(meta["max_entries"]) != max_entries:
+            # The file's size is fixed when it is created; delete the directory to resize it
+            print(f"Embedding cache at {path} holds {meta['max_entries']} entries, not {max_entries}; keeping its size")
+            self.max_entries = int(meta["max_entries"])
+        if meta.get("dim"):
+            self._open(int(meta["dim"]))
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(os.path.join(self.path, INDEX_FILE), timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _reset(self, conn):
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("DROP TABLE IF EXISTS entries")
+        conn.execute("""
+            CREATE TABLE entries (
+                key BLOB PRIMARY KEY,
+                slot INTEGER NOT NULL,
+                ready INTEGER NOT NULL DEFAULT 0,
+                generation INTEGER NOT NULL DEFAULT 0,
+                last_used REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX entries_last_used ON entries (last_used)")
+        conn.execute("DELETE FROM meta")
+        conn.executemany("INSERT INTO meta (key, value) VALUES (?, ?)", [
+            ("model_name", self.model_name), ("schema", SCHEMA_VERSION),
+            ("max_entries", str(self.max_entries)), ("next_slot", "0"),
+        ])
+        conn.execute("COMMIT")
+        for name in (VECTORS_FILE, GENERATIONS_FILE):
+            if os.path.exists(os.path.join(self.path, name)):
+                os.remove(os.path.join(self.path, name))
+
+    def _open(self, dim):
+        """Map the vectors file; it is created at full size (sparse) so it never grows"""
+        vectors_path = os.path.join(self.path, VECTORS_FILE)
+        size = self.max_entries * dim * 4
+        if not os.path.exists(vectors_path) or os.path.getsize(vectors_path) != size:
+            with open(vectors_path, "ab") as f:
+                f.truncate(size)
+        self._vectors = np.memmap(vectors_path, dtype=np.float32, mode="r+", shape=(self.max_entries, dim))
+        generations_path = os.path.join(self.path, GENERATIONS_FILE)
+        if not os.path.exists(generations_path) or os.path.getsize(generations_path) != self.max_entries * 8:
+            with open(generations_path, "ab") as f:
+                f.truncate(self.max_entries * 8)
+        self._generations = np.memmap(generations_path, dtype=np.uint64, mode="r+", shape=(self.max_entries,))
+        self._dim = dim
+
+    @staticmethod
+    def key(text, kind="document"):
+        return hashlib.blake2b(f"{kind}\0{text}".encode("utf-8"), digest_size=16).digest()
+
+    def get_many(self, keys):
+        """Cached vectors for `keys`, None where missing"""
+        found = [None] * len(keys)
+        if self._vectors is None:
+            dim = self._connection().execute("SELECT value FROM meta WHERE key = 'dim'").fetchone()
+            if dim is None:
+                return found
+            self._open(int(dim[0]))
+
+        conn = self._connection()
+        now = time.time()
+        positions = {key: i for i, key in enumerate(keys)}
+        stale = []
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            rows = conn.execute(
+                f"SELECT key, slot, generation, last_used FROM entries "
+                f"WHERE ready = 1 AND key IN ({','.join('?' * len(batch))})",
+                batch
+            ).fetchall()
+            for key, slot, generation, last_used in rows:
+                vector = np.array(self._vectors[slot])
+                if int(self._generations[slot]) != generation:
+                    # The slot was reused while we read it; treat as a miss
+                    continue
+                found[positions[key]] = vector
+                if now - last_used > self.touch_interval:
+                    stale.append(key)
+        if stale:
+            # Recency only needs to be roughly right, so hits rarely write
+            conn.executemany("UPDATE entries SET last_used = ? WHERE key = ?", [(now, key) for key in stale])
+        return found
+
+    def put_many(self, keys, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if not len(keys):
+            return
+        conn = self._connection()
+        now = time.time()
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if self._vectors is None:
+                row = conn.execute("SELECT value FROM meta WHERE key = 'dim'").fetchone()
+                if row is None:
+                    conn.execute("INSERT INTO meta (key, value) VALUES ('dim', ?)", (str(vectors.shape[1]),))
+                self._open(int(row[0]) if row else vectors.shape[1])
+
+            rows = conn.execute(
+                f"SELECT key, slot, ready, generation FROM entries WHERE key IN ({','.join('?' * len(keys))})", keys
+            ).fetchall()
+            present = {key for key, slot, ready, generation in rows
+                       if ready and generation == int(self._generations[slot])}
+            todo = [(key, vector) for key, vector in zip(keys, vectors) if key not in present]
+            todo = list(dict((key, vector) for key, vector in todo).items())[:self.max_entries]
+
+            # Reserved but never marked ready (a writer died mid-way), or unreadable: take the slot over
+            unready = [(key, slot) for key, slot, _, _ in rows if key not in present]
+            conn.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in unready])
+            slots = [slot for _, slot in unready][:len(todo)]
+
+            next_slot = int(conn.execute("SELECT value FROM meta WHERE key = 'next_slot'").fetchone()[0])
+            fresh = min(len(todo) - len(slots), self.max_entries - next_slot)
+            slots.extend(range(next_slot, next_slot + fresh))
+            if len(slots) < len(todo):
+                evicted = conn.execute(
+                    "SELECT key, slot FROM entries ORDER BY last_used LIMIT ?", (len(todo) - len(slots),)
+                ).fetchall()
+                conn.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in evicted])
+                slots.extend(slot for _, slot in evicted)
+            conn.execute("UPDATE meta SET value = ? WHERE key = 'next_slot'", (str(next_slot + fresh),))
+            todo = todo[:len(slots)]
+            conn.executemany(
+                "INSERT INTO entries (key, slot, ready, last_used) VALUES (?, ?, 0, ?)",
+                [(key, slot, now) for (key, _), slot in zip(todo, slots)]
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+        for (_, vector), slot in zip(todo, slots):
+            # Odd while the write is under way, so no reader can match it
+            self._generations[slot] += 1
+            self._vectors[slot] = vector
+            self._generations[slot] += 1
+        self._vectors.flush()
+        self._generations.flush()
+        conn.executemany(
+            "UPDATE entries SET ready = 1, generation = ? WHERE key = ? AND slot = ?",
+            [(int(self._generations[slot]), key, slot) for (key, _), slot in zip(todo, slots)]
+        )
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM entries WHERE ready = 1").fetchone()[0]
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only runs the model for texts the cache hasn't seen"""
+
+    def __init__(self, embeddings, cache=None, model_name=None):
+        self.embeddings = embeddings
+        self.model_name = model_name or getattr(embeddings, "model_name", type(embeddings).__name__)
+        self.cache = cache if cache is not None else EmbeddingCache(
+            self.model_name,
+            max_entries=int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "50000"))
+        )
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.embed_seconds = 0.0
+
+    def __getattr__(self, name):
+        # Anything else (e.g. `_client`) comes from the wrapped embeddings
+        if name == "embeddings":
+            raise AttributeError(name)
+        return getattr(self.embeddings, name)
+
+    def _embed(self, texts, kind, compute):
+        keys = [EmbeddingCache.key(text, kind) for text in texts]
+        vectors = self.cache.get_many(keys)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            started = time.perf_counter()
+            computed = compute([texts[i] for i in missing])
+            elapsed = time.perf_counter() - started
+            self.cache.put_many([keys[i] for i in missing], computed)
+            for i, vector in zip(missing, computed):
+                vectors[i] = vector
+        else:
+            elapsed = 0.0
+        with self._lock:
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+            self.embed_seconds += elapsed
+        return [list(map(float, vector)) for vector in vectors]
+
+    def embed_documents(self, texts):
+        return self._embed(list(texts), "document", self.embeddings.embed_documents)
+
+    def embed_query(self, text):
+        return self._embed([text], "query", lambda texts: [self.embeddings.embed_query(texts[0])])[0]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        per_text = self.embed_seconds / self.misses if self.misses else None
+        return {
+            "model_name": self.model_name,
+            "entries": len(self.cache),
+            "max_entries": self.cache.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "embed_seconds": round(self.embed_seconds, 3),
+            # Estimated from the average cost of a miss
+            "seconds_saved": round(self.hits * per_text, 3) if per_text is not None else None,
+        }
@@ -0,0 +1,292 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from langchain_core.documents import Document
+from src.local_index import LOCAL_INDEX_DIR, write_local_index_rows
+
+INGEST_MANIFEST_PATH = os.getenv("INGEST_MANIFEST_PATH", "artifacts/ingest_manifest.db")
+
+
+def dish_text(row):
+    """The text we embed for one Nigerian-Dishes row"""
+    return (
+        f"Food Name: {row['Food_Name']}. Main Ingredients: {row['Main_Ingredients']}. "
+        f"Description: {row['Description']}. Health Benefits: {row['Food_Health']}. "
+        f"Class: {row['Food_Class']}. Region: {row['Region']}"
+    )
+
+
+def content_hash(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class IngestManifest:
+    """Which row hashes each target already holds, and in which run they were last seen
+
+    Rows are keyed by the hash of their text, so an edited row looks like a new
+    row plus a vanished one: the new version is embedded and the old one deleted.
+    """
+
+    def __init__(self, path=INGEST_MANIFEST_PATH, target="pinecone"):
+        self.path = path
+        self.target = target
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS ingested_rows (
+                target TEXT NOT NULL,
+                row_hash TEXT NOT NULL,
+                chunk_count INTEGER NOT NULL,
+                run_id TEXT NOT NULL,
+                PRIMARY KEY (target, row_hash)
+            )
+        """)
+
+    def __len__(self):
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM ingested_rows WHERE target = ?", (self.target,)
+        ).fetchone()[0]
+
+    def mark_seen(self, hashes, run_id):
+        """Stamp the hashes we already hold with this run; returns the ones that are new"""
+        if not hashes:
+            return set()
+        placeholders = ",".join("?" * len(hashes))
+        known = {row[0] for row in self.conn.execute(
+            f"SELECT row_hash FROM ingested_rows WHERE target = ? AND row_hash IN ({placeholders})",
+            (self.target, *hashes)
+        )}
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE ingested_rows SET run_id = ? WHERE target = ? AND row_hash = ?",
+                [(run_id, self.target, row_hash) for row_hash in known]
+            )
+        return set(hashes) - known
+
+    def record(self, chunk_counts, run_id):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO ingested_rows (target, row_hash, chunk_count, run_id) VALUES (?, ?, ?, ?)",
+                [(self.target, row_hash, count, run_id) for row_hash, count in chunk_counts.items()]
+            )
+
+    def stale(self, run_id, batch_size=1000):
+        """Rows not seen in this run, in batches of (row_hash, chunk_count); forget each batch before the next"""
+        while True:
+            rows = self.conn.execute(
+                "SELECT row_hash, chunk_count FROM ingested_rows WHERE target = ? AND run_id != ? LIMIT ?",
+                (self.target, run_id, batch_size)
+            ).fetchall()
+            if not rows:
+                return
+            yield rows
+
+    def forget(self, hashes):
+        with self.conn:
+            self.conn.executemany(
+                "DELETE FROM ingested_rows WHERE target = ? AND row_hash = ?",
+                [(self.target, row_hash) for row_hash in hashes]
+            )
+
+    def close(self):
+        self.conn.close()
+
+
+def chunk_ids(row_hash, chunk_count):
+    return [f"{row_hash}-{i}" for i in range(chunk_count)]
+
+
+class PineconeSink:
+    """Bulk upserts and deletes against a Pinecone index, in the layout PineconeVectorStore reads"""
+
+    def __init__(self, index, batch_size=200, text_key="text"):
+        self.index = index
+        self.batch_size = batch_size
+        self.text_key = text_key
+
+    def reset(self):
+        self.index.delete(delete_all=True)
+
+    def upsert(self, chunks, vectors):
+        records = [
+            (chunk.id, list(map(float, vector)), {**chunk.metadata, self.text_key: chunk.page_content})
+            for chunk, vector in zip(chunks, vectors)
+        ]
+        for batch in batched(records, self.batch_size):
+            self.index.upsert(vectors=batch)
+
+    def delete(self, ids):
+        for batch in batched(ids, 1000):
+            self.index.delete(ids=batch)
+
+    def finish(self):
+        pass
+
+
+class LocalIndexSink:
+    """Keeps chunks and vectors in SQLite, then streams them into the memory-mapped local index"""
+
+    def __init__(self, path=LOCAL_INDEX_DIR, model_name=None):
+        self.path = path
+        self.model_name = model_name
+        os.makedirs(path, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(path, "chunks.db"))
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                id TEXT PRIMARY KEY,
+                page_content TEXT NOT NULL,
+                metadata TEXT NOT NULL,
+                vector BLOB NOT NULL
+            )
+        """)
+        self.dim = 0
+
+    def reset(self):
+        with self.conn:
+            self.conn.execute("DELETE FROM chunks")
+
+    def upsert(self, chunks, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self.dim = vectors.shape[1]
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO chunks (id, page_content, metadata, vector) VALUES (?, ?, ?, ?)",
+                [
+                    (chunk.id, chunk.page_content, json.dumps(chunk.metadata), vector.tobytes())
+                    for chunk, vector in zip(chunks, vectors)
+                ]
+            )
+
+    def delete(self, ids):
+        with self.conn:
+            self.conn.executemany("DELETE FROM chunks WHERE id = ?", [(chunk_id,) for chunk_id in ids])
+
+    def _rows(self):
+        for chunk_id, page_content, metadata, vector in self.conn.execute(
+            "SELECT id, page_content, metadata, vector FROM chunks ORDER BY id"
+        ):
+            yield (
+                np.frombuffer(vector, dtype=np.float32),
+                Document(id=chunk_id, page_content=page_content, metadata=json.loads(metadata)),
+            )
+
+    def finish(self):
+        if not self.dim:
+            row = self.conn.execute("SELECT vector FROM chunks LIMIT 1").fetchone()
+            self.dim = len(row[0]) // 4 if row else 0
+        write_local_index_rows(self.path, self._rows(), self.dim, self.model_name)
+
+
+class IngestPipeline:
+    """Streams rows -> hash diff -> chunks -> parallel embedding -> bulk upsert, in bounded memory
+
+    At most `embed_workers` embedding batches are in flight at once, so memory
+    depends on the batch sizes, never on the size of the dataset.
+    """
+
+    def __init__(self, embeddings, sink, manifest, splitter, to_text=dish_text,
+                 row_batch_size=256, embed_batch_size=64, embed_workers=4):
+        self.embeddings = embeddings
+        self.sink = sink
+        self.manifest = manifest
+        self.splitter = splitter
+        self.to_text = to_text
+        self.row_batch_size = row_batch_size
+        self.embed_batch_size = embed_batch_size
+        self.embed_workers = embed_workers
+        self.stats = {}
+
+    def _changed_rows(self, rows, run_id):
+        """Yield (row_hash, row, text) for rows the target doesn't hold yet"""
+        for batch in batched(rows, self.row_batch_size):
+            self.stats["rows"] += len(batch)
+            keyed = {}
+            for row in batch:
+                text = self.to_text(row)
+                keyed.setdefault(content_hash(text), (row, text))
+            new = self.manifest.mark_seen(list(keyed), run_id)
+            for row_hash in new:
+                row, text = keyed[row_hash]
+                yield row_hash, row, text
+
+    def _chunks(self, changed):
+        for row_hash, row, text in changed:
+            self.stats["changed_rows"] += 1
+            pieces = self.splitter.split_text(text)
+            for i, piece in enumerate(pieces):
+                yield Document(
+                    id=f"{row_hash}-{i}",
+                    page_content=piece,
+                    metadata={"row_hash": row_hash, "chunk": i, "chunks": len(pieces), "food_name": row.get("Food_Name")}
+                )
+
+    def _embedded(self, chunks):
+        """Embed batches on a thread pool; yields (chunks, vectors) in order"""
+        with ThreadPoolExecutor(max_workers=self.embed_workers) as executor:
+            in_flight = deque()
+            for batch in batched(chunks, self.embed_batch_size):
+                if len(in_flight) >= self.embed_workers:
+                    done, future = in_flight.popleft()
+                    yield done, future.result()
+                texts = [chunk.page_content for chunk in batch]
+                in_flight.append((batch, executor.submit(self.embeddings.embed_documents, texts)))
+            while in_flight:
+                done, future = in_flight.popleft()
+                yield done, future.result()
+
+    def run(self, rows):
+        """Bring the target in line with `rows`; returns throughput stats"""
+        run_id = uuid.uuid4().hex
+        self.stats = {"rows": 0, "changed_rows": 0, "embeddings": 0, "deleted_rows": 0}
+        started = time.perf_counter()
+
+        # Chunks of a row still waiting to be upserted; a row is recorded only once
+        # all of them are in, so an interrupted run redoes it next time
+        remaining = {}
+        for chunks, vectors in self._embedded(self._chunks(self._changed_rows(rows, run_id))):
+            self.sink.upsert(chunks, vectors)
+            self.stats["embeddings"] += len(chunks)
+            complete = {}
+            for chunk in chunks:
+                row_hash, total = chunk.metadata["row_hash"], chunk.metadata["chunks"]
+                remaining[row_hash] = remaining.get(row_hash, total) - 1
+                if remaining[row_hash] == 0:
+                    del remaining[row_hash]
+                    complete[row_hash] = total
+            self.manifest.record(complete, run_id)
+
+        for stale in self.manifest.stale(run_id):
+            ids = [chunk_id for row_hash, count in stale for chunk_id in chunk_ids(row_hash, count)]
+            self.sink.delete(ids)
+            self.manifest.forget([row_hash for row_hash, _ in stale])
+            self.stats["deleted_rows"] += len(stale)
+
+        self.sink.finish()
+        elapsed = time.perf_counter() - started
+        self.stats["seconds"] = round(elapsed, 3)
+        self.stats["rows_per_second"] = round(self.stats["rows"] / elapsed, 1) if elapsed else None
+        self.stats["embeddings_per_second"] = round(self.stats["embeddings"] / elapsed, 1) if elapsed else None
+        return self.stats
+
+    @property
+    def changed(self):
+        return bool(self.stats.get("changed_rows") or self.stats.get("deleted_rows"))
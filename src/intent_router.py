@@ -0,0 +1,119 @@
+import re
+import threading
+import time
+import numpy as np
+
+# Intents that need retrieval + generation; everything else is answered locally
+LLM_INTENTS = {"menu", "question"}
+
+# Intents that change the cart or start payment; a weak embedding match never reaches them
+ACTION_INTENTS = {"cart_add", "cart_remove", "checkout"}
+
+# What follows an ordering verb when it isn't a dish: "can I have it without pepper",
+# "I'd like to learn about moi moi", "get me the menu", "can I get a recommendation"
+NOT_AN_ITEM = (
+    r"(?:(?:the|your|a|an|some|more) )?"
+    r"(?:to|it|that|this|them|those|you|me|us|something|anything|menu|recommend\w*|suggest\w*|"
+    r"help|info|information|advice|order|status|is|was|has)\b"
+)
+ORDER_VERB = (
+    r"(?:add|(?<!my )(?<!the )(?<!your )order|buy|i(?:'ll| will) (?:have|take)|"
+    r"i(?:'d| would) like(?: to (?:order|have|get|buy))?|i want(?: to (?:order|have|get|buy))?|"
+    r"get me|can i (?:get|have|order))"
+)
+
+# Checked in order; the first pattern that matches wins
+KEYWORD_PATTERNS = [
+    ("checkout", r"\b(check ?out(?!\s+(your|the|some))|pay now|make (a |the )?payment|proceed to pay(ment)?|i(?:'m| am) ready to pay|place (my|the) order)\b"),
+    ("order_status", r"\b(order status|status of my order|where(?:'s| is) my (order|food)|track (my )?order|has my (order|food) (been|left)|when will my (order|food))\b"),
+    ("cart_remove", r"\b(remove|delete|take out|drop|cancel)\b.*\b(from (my )?cart|cart)\b|\bclear (my |the )?cart\b|\bempty (my |the )?cart\b|^remove\b"),
+    ("cart_view", r"\b(view|show|see|check|display)( me)? (my |the )?cart\b|\bwhat(?:'s| is) in my cart\b|^(my )?cart$"),
+    # An ordering verb followed by something that could be a dish
+    ("cart_add", rf"\b{ORDER_VERB}\s+(?!{NOT_AN_ITEM})[a-z0-9]"),
+    ("menu", r"\b(menu|dishes|what do you (have|sell|serve|offer)|options|recommend|suggest)\b"),
+    ("thanks", r"\b(thanks|thank you|thx|appreciate it|much appreciated)\b"),
+    ("greeting", r"^\s*(hi|hello|hey|hiya|howdy|good (morning|afternoon|evening)|yo)\b[\s!.?]*$"),
+]
+
+# A few examples per intent; their mean embeddings are the centroids
+INTENT_EXAMPLES = {
+    "greeting": ["hi", "hello there", "good morning", "hey, how are you"],
+    "thanks": ["thank you", "thanks a lot", "that's helpful, thanks", "great, cheers"],
+    "cart_add": ["add jollof rice to my cart", "I'd like two plates of egusi", "order pounded yam", "I'll take the suya"],
+    "cart_view": ["show my cart", "what's in my basket", "what have I ordered so far", "view cart"],
+    "cart_remove": ["remove the egusi", "take the rice out of my cart", "clear my cart", "I don't want the suya anymore"],
+    "checkout": ["checkout", "I'm ready to pay", "let's pay now", "complete my order"],
+    "order_status": ["where is my order", "has my food left", "track my delivery", "how long until my food arrives"],
+    "menu": ["what's on the menu", "what dishes do you have", "show me your soups", "recommend something spicy"],
+    "question": ["what is egusi made of", "is afang soup healthy", "which region is ofada rice from", "how is moi moi prepared"],
+}
+
+
+class RouteResult:
+    def __init__(self, intent, source, score=1.0, elapsed=0.0):
+        self.intent = intent
+        self.source = source
+        self.score = score
+        self.elapsed = elapsed
+
+    @property
+    def needs_llm(self):
+        return self.intent in LLM_INTENTS
+
+
+class IntentRouter:
+    """Routes messages locally: compiled keyword patterns first, then nearest intent centroid"""
+
+    def __init__(self, embeddings=None, examples=INTENT_EXAMPLES, patterns=KEYWORD_PATTERNS, min_score=0.35,
+                 action_min_score=0.6):
+        self.embeddings = embeddings
+        self.examples = examples
+        self.min_score = min_score
+        self.action_min_score = action_min_score
+        self._patterns = [(intent, re.compile(pattern, re.IGNORECASE)) for intent, pattern in patterns]
+        self._lock = threading.Lock()
+        self._labels = None
+        self._centroids = None
+
+    def classify_keywords(self, text):
+        for intent, pattern in self._patterns:
+            if pattern.search(text):
+                return intent
+        return None
+
+    def _ensure_centroids(self):
+        if self._centroids is not None:
+            return
+        with self._lock:
+            if self._centroids is not None:
+                return
+            labels, centroids = [], []
+            for intent, examples in self.examples.items():
+                vectors = np.asarray(self.embeddings.embed_documents(examples), dtype=np.float32)
+                centroid = vectors.mean(axis=0)
+                labels.append(intent)
+                centroids.append(centroid / np.linalg.norm(centroid))
+            self._labels = labels
+            self._centroids = np.vstack(centroids)
+
+    def classify_vector(self, vector):
+        """Nearest centroid by cosine similarity; (intent, score)"""
+        self._ensure_centroids()
+        vector = np.asarray(vector, dtype=np.float32)
+        scores = self._centroids @ (vector / np.linalg.norm(vector))
+        best = int(np.argmax(scores))
+        return self._labels[best], float(scores[best])
+
+    def route(self, text, vector=None):
+        """Classify a message; pass the query embedding to enable centroid matching"""
+        started = time.perf_counter()
+        intent = self.classify_keywords(text)
+        if intent is not None:
+            return RouteResult(intent, "keyword", elapsed=time.perf_counter() - started)
+
+        if vector is not None and self.embeddings is not None:
+            intent, score = self.classify_vector(vector)
+            if score >= (self.action_min_score if intent in ACTION_INTENTS else self.min_score):
+                return RouteResult(intent, "centroid", score, time.perf_counter() - started)
+
+        return RouteResult("question", "default", 0.0, time.perf_counter() - started)
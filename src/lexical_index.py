@@ -0,0 +1,226 @@
+import json
+import math
+import os
+import threading
+import time
+from collections import Counter, deque
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from src.menu_catalog import PARENTHETICAL, normalize
+
+LEXICAL_INDEX_PATH = os.getenv("LEXICAL_INDEX_PATH", "artifacts/lexical_index.json")
+
+# Indexed fields and how much a match in each counts
+FIELD_WEIGHTS = {"Food_Name": 3, "Main_Ingredients": 1, "Region": 1, "Food_Class": 1}
+
+STOPWORDS = {
+    "a", "an", "and", "are", "can", "do", "does", "for", "from", "how", "i", "in", "is", "it", "me",
+    "of", "on", "or", "s", "some", "tell", "the", "to", "what", "whats", "which", "with", "you", "your",
+}
+
+
+def tokenize(text):
+    return [token for token in normalize(text or "").split() if token not in STOPWORDS]
+
+
+class LexicalIndex:
+    """BM25 over dish name, ingredients, region and class, plus an exact dish-name lookup"""
+
+    def __init__(self, dishes, k1=1.5, b=0.75):
+        self.dishes = dishes
+        self.k1 = k1
+        self.b = b
+
+        self._names = {}      # normalized dish name -> dish index
+        self._max_name_tokens = 1
+        self._postings = {}   # token -> [(dish index, weighted term frequency)]
+        self._lengths = []
+
+        for index, dish in enumerate(dishes):
+            for name in {normalize(dish["Food_Name"]), normalize(PARENTHETICAL.sub("", dish["Food_Name"]))}:
+                if name:
+                    self._names.setdefault(name, index)
+                    self._max_name_tokens = max(self._max_name_tokens, len(name.split()))
+
+            counts = Counter()
+            for field, weight in FIELD_WEIGHTS.items():
+                for token in tokenize(dish.get(field)):
+                    counts[token] += weight
+            for token, count in counts.items():
+                self._postings.setdefault(token, []).append((index, count))
+            self._lengths.append(sum(counts.values()))
+
+        self._average_length = sum(self._lengths) / len(self._lengths) if self._lengths else 0
+        self._idf = {
+            token: math.log(1 + (len(dishes) - len(postings) + 0.5) / (len(postings) + 0.5))
+            for token, postings in self._postings.items()
+        }
+
+    @classmethod
+    def load(cls, path=LEXICAL_INDEX_PATH):
+        """Load the index written by store_index.py; empty if it hasn't been built"""
+        try:
+            with open(path) as f:
+                return cls(json.load(f)["dishes"])
+        except FileNotFoundError:
+            return cls([])
+
+    def save(self, path=LEXICAL_INDEX_PATH):
+        writer = LexicalIndexWriter(path)
+        for dish in self.dishes:
+            writer.add(dish)
+        writer.commit()
+
+    def __len__(self):
+        return len(self.dishes)
+
+    def exact_dishes(self, text):
+        """Dishes named in full in the text, longest names claimed first"""
+        tokens = normalize(text or "").split()
+        claimed = [False] * len(tokens)
+        found = []
+        for size in range(min(self._max_name_tokens, len(tokens)), 0, -1):
+            for start in range(len(tokens) - size + 1):
+                if any(claimed[start:start + size]):
+                    continue
+                index = self._names.get(" ".join(tokens[start:start + size]))
+                if index is not None:
+                    claimed[start:start + size] = [True] * size
+                    found.append((start, self.dishes[index]))
+        return [dish for _, dish in sorted(found, key=lambda item: item[0])]
+
+    def search(self, text, k=3):
+        """Top-k (dish, score) by BM25"""
+        scores = {}
+        for token in set(tokenize(text)):
+            idf = self._idf.get(token)
+            if idf is None:
+                continue
+            for index, frequency in self._postings[token]:
+                norm = 1 - self.b + self.b * self._lengths[index] / self._average_length
+                scores[index] = scores.get(index, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + self.k1 * norm)
+        top = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(self.dishes[index], score) for index, score in top]
+
+
+class LexicalIndexWriter:
+    """Writes the file LexicalIndex.load reads one dish at a time, so ingestion never holds them all"""
+
+    def __init__(self, path=LEXICAL_INDEX_PATH):
+        self.path = path
+        self.count = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = open(path + ".tmp", "w")
+        self._file.write('{"dishes": [')
+
+    def add(self, dish):
+        self._file.write((", " if self.count else "") + json.dumps(dish))
+        self.count += 1
+
+    def commit(self):
+        self._file.write("]}")
+        self._file.close()
+        os.replace(self.path + ".tmp", self.path)
+
+    def discard(self):
+        self._file.close()
+        os.remove(self.path + ".tmp")
+
+
+def dish_document(dish, source):
+    return Document(
+        page_content=dish["text"],
+        metadata={"row_hash": dish.get("row_hash"), "food_name": dish["Food_Name"], "source": source}
+    )
+
+
+def _food_name(doc):
+    metadata = doc.metadata or {}
+    if metadata.get("food_name"):
+        return normalize(metadata["food_name"])
+    if doc.page_content.startswith("Food Name: "):
+        return normalize(doc.page_content[len("Food Name: "):].split(".", 1)[0])
+    return metadata.get("row_hash") or doc.page_content[:80]
+
+
+class RetrievalMetrics:
+    """Latency per retrieval path (exact, hybrid, dense)"""
+
+    def __init__(self, max_samples=1000):
+        self._lock = threading.Lock()
+        self._samples = {}
+        self.max_samples = max_samples
+
+    def record(self, path, seconds):
+        with self._lock:
+            self._samples.setdefault(path, deque(maxlen=self.max_samples)).append(seconds)
+
+    def stats(self):
+        with self._lock:
+            samples = {path: sorted(values) for path, values in self._samples.items()}
+        total = sum(len(values) for values in samples.values())
+        return {
+            path: {
+                "requests": len(values),
+                "share": round(len(values) / total, 4),
+                "p50_ms": round(values[len(values) // 2] * 1000, 3),
+                "p95_ms": round(values[min(len(values) - 1, int(len(values) * 0.95))] * 1000, 3),
+            }
+            for path, values in samples.items()
+        }
+
+
+class HybridRetriever(BaseRetriever):
+    """Exact dish-name fast path, otherwise BM25 and dense results fused by reciprocal rank"""
+
+    dense: BaseRetriever
+    lexical: LexicalIndex
+    k: int = 3
+    rrf_k: int = 60
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    def _exact(self, query):
+        dishes = self.lexical.exact_dishes(query)
+        return [dish_document(dish, "exact") for dish in dishes[:self.k]] or None
+
+    def _fuse(self, query, dense_docs):
+        """Rank dishes by summed 1/(rrf_k + rank) across both lists; dense chunks win over whole-dish text"""
+        scores, documents = {}, {}
+        for rank, doc in enumerate(dense_docs):
+            key = _food_name(doc)
+            if key not in documents:
+                # A dish ranks by its best chunk
+                scores[key] = 1 / (self.rrf_k + rank + 1)
+            documents.setdefault(key, []).append(doc)
+        for rank, (dish, _) in enumerate(self.lexical.search(query, self.k)):
+            key = normalize(dish["Food_Name"])
+            scores[key] = scores.get(key, 0.0) + 1 / (self.rrf_k + rank + 1)
+            documents.setdefault(key, [dish_document(dish, "lexical")])
+
+        ranked = sorted(scores, key=scores.get, reverse=True)[:self.k]
+        return [doc for key in ranked for doc in documents[key]]
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        started = time.perf_counter()
+        exact = self._exact(query)
+        if exact is not None:
+            retrieval_metrics.record("exact", time.perf_counter() - started)
+            return exact
+        documents = self._fuse(query, self.dense.invoke(query))
+        retrieval_metrics.record("hybrid", time.perf_counter() - started)
+        return documents
+
+    async def _aget_relevant_documents(self, query, *, run_manager=None):
+        started = time.perf_counter()
+        exact = self._exact(query)
+        if exact is not None:
+            retrieval_metrics.record("exact", time.perf_counter() - started)
+            return exact
+        documents = self._fuse(query, await self.dense.ainvoke(query))
+        retrieval_metrics.record("hybrid", time.perf_counter() - started)
+        return documents
+
+
+# Global retrieval metrics instance
+retrieval_metrics = RetrievalMetrics()
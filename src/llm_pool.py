@@ -0,0 +1,164 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from src.tracing import metrics
+
+DEFAULT_MODEL = os.getenv("GROQ_MODEL", "llama-3.1-70b-versatile")
+
+
+class SlotTimeout(Exception):
+    """No LLM slot came free before the caller's deadline"""
+
+
+class ModelLimiter:
+    """Caps in-flight requests to one model and admits waiters in FIFO order"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.in_flight = 0
+        self._waiters = deque()
+
+    @property
+    def queued(self):
+        return len(self._waiters)
+
+    async def acquire(self):
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we were cancelled; pass it on
+                self.release()
+            elif waiter in self._waiters:
+                # release() may already have skipped (and dropped) our cancelled future
+                self._waiters.remove(waiter)
+            raise
+
+    def release(self):
+        # Hand the slot straight to the next waiter so nobody can jump the queue
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+
+class LLMPool:
+    """Shared Groq clients per model/temperature profile with per-model concurrency caps"""
+
+    def __init__(self, max_in_flight=8):
+        self.max_in_flight = max_in_flight
+        self._lock = threading.Lock()
+        self._clients = {}
+        self._limiters = {}
+        self._metrics = {}
+
+    def get_llm(self, model=DEFAULT_MODEL, temperature=0.3, streaming=False):
+        """Reuse one client (and its HTTP connection pool) per profile"""
+        key = (model, temperature, streaming)
+        llm = self._clients.get(key)
+        if llm is None:
+            with self._lock:
+                llm = self._clients.get(key)
+                if llm is None:
+                    from langchain_groq import ChatGroq
+                    llm = ChatGroq(
+                        groq_api_key=os.getenv("GROQ_API_KEY"),
+                        model_name=model,
+                        temperature=temperature,
+                        streaming=streaming
+                    )
+                    self._clients[key] = llm
+        return llm
+
+    def _limiter(self, model):
+        if model not in self._limiters:
+            self._limiters[model] = ModelLimiter(self.max_in_flight)
+            self._metrics[model] = {
+                "requests": 0,
+                "errors": 0,
+                "queue_wait_seconds": 0.0,
+                "max_queue_wait_seconds": 0.0,
+                "latency_seconds": 0.0,
+                "max_latency_seconds": 0.0,
+            }
+        return self._limiters[model]
+
+    def queued(self, model=DEFAULT_MODEL):
+        limiter = self._limiters.get(model)
+        return limiter.queued if limiter else 0
+
+    @asynccontextmanager
+    async def slot(self, model=DEFAULT_MODEL, timeout=None):
+        """Hold one of the model's in-flight slots for the duration of a call
+
+        With a timeout, raises SlotTimeout if no slot frees up in time.
+        """
+        limiter = self._limiter(model)
+        metrics = self._metrics[model]
+
+        queued_at = time.perf_counter()
+        try:
+            await asyncio.wait_for(limiter.acquire(), timeout)
+        except asyncio.TimeoutError:
+            raise SlotTimeout(f"no {model} slot within {timeout}s") from None
+        started = time.perf_counter()
+        waited = started - queued_at
+        metrics["queue_wait_seconds"] += waited
+        metrics["max_queue_wait_seconds"] = max(metrics["max_queue_wait_seconds"], waited)
+
+        try:
+            yield
+        except BaseException:
+            metrics["errors"] += 1
+            raise
+        finally:
+            limiter.release()
+            latency = time.perf_counter() - started
+            metrics["requests"] += 1
+            metrics["latency_seconds"] += latency
+            metrics["max_latency_seconds"] = max(metrics["max_latency_seconds"], latency)
+
+    async def ainvoke(self, prompt, model=DEFAULT_MODEL, temperature=0.3):
+        async with self.slot(model):
+            return await self.get_llm(model, temperature).ainvoke(prompt)
+
+    def stats(self):
+        models = {}
+        for model, limiter in self._limiters.items():
+            metrics = self._metrics[model]
+            requests = metrics["requests"]
+            models[model] = {
+                "in_flight": limiter.in_flight,
+                "queued": limiter.queued,
+                "limit": limiter.limit,
+                "requests": requests,
+                "errors": metrics["errors"],
+                "avg_queue_wait_seconds": round(metrics["queue_wait_seconds"] / requests, 4) if requests else None,
+                "max_queue_wait_seconds": round(metrics["max_queue_wait_seconds"], 4),
+                "avg_latency_seconds": round(metrics["latency_seconds"] / requests, 4) if requests else None,
+                "max_latency_seconds": round(metrics["max_latency_seconds"], 4),
+            }
+        return {"clients": len(self._clients), "models": models}
+
+
+# Global LLM pool instance
+llm_pool = LLMPool(max_in_flight=int(os.getenv("LLM_MAX_IN_FLIGHT", "8")))
+metrics.gauge(
+    "dishdash_llm_in_flight", "LLM calls holding a slot, all models",
+    lambda: sum(limiter.in_flight for limiter in llm_pool._limiters.values())
+)
+metrics.gauge(
+    "dishdash_llm_queued", "LLM calls waiting for a slot, all models",
+    lambda: sum(limiter.queued for limiter in llm_pool._limiters.values())
+)
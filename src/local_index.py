@@ -0,0 +1,164 @@
+import json
+import os
+import uuid
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", "artifacts/local_index")
+VECTORS_FILE = "vectors.f32"
+DOCUMENTS_FILE = "documents.jsonl"
+OFFSETS_FILE = "offsets.u64"
+META_FILE = "meta.json"
+
+
+def _normalize(matrix):
+    """L2-normalize rows so cosine similarity becomes a plain dot product"""
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def write_local_index_rows(path, rows, dim, model_name=None):
+    """Stream (vector, document) pairs into an index without holding the matrix in memory
+
+    Vectors go to a contiguous float32 file and documents to a JSON-lines file,
+    with each line's byte offset in a uint64 file, so readers map both.
+    """
+    os.makedirs(path, exist_ok=True)
+    paths = {name: os.path.join(path, name) for name in (VECTORS_FILE, DOCUMENTS_FILE, OFFSETS_FILE, META_FILE)}
+
+    # Write to temp files and rename so readers never see a half-written index
+    count = 0
+    offset = 0
+    with open(paths[VECTORS_FILE] + ".tmp", "wb") as vectors_file, \
+            open(paths[DOCUMENTS_FILE] + ".tmp", "wb") as documents_file, \
+            open(paths[OFFSETS_FILE] + ".tmp", "wb") as offsets_file:
+        for vector, doc in rows:
+            vector = _normalize(np.asarray(vector, dtype=np.float32))
+            vectors_file.write(np.ascontiguousarray(vector, dtype=np.float32).tobytes())
+            line = (json.dumps({"id": doc.id, "page_content": doc.page_content, "metadata": doc.metadata}) + "\n").encode("utf-8")
+            offsets_file.write(np.uint64(offset).tobytes())
+            documents_file.write(line)
+            offset += len(line)
+            count += 1
+        # The end of the last document, so every document's length is the gap to the next offset
+        offsets_file.write(np.uint64(offset).tobytes())
+
+    with open(paths[META_FILE] + ".tmp", "w") as f:
+        json.dump({"count": count, "dim": dim, "model_name": model_name}, f)
+    for name in (VECTORS_FILE, DOCUMENTS_FILE, OFFSETS_FILE, META_FILE):
+        os.replace(paths[name] + ".tmp", paths[name])
+
+
+class MappedDocuments:
+    """Read-only sequence of an index's documents, each read from disk when it is asked for"""
+
+    def __init__(self, path, count):
+        self._file = open(os.path.join(path, DOCUMENTS_FILE), "rb")
+        self._offsets = np.memmap(os.path.join(path, OFFSETS_FILE), dtype=np.uint64, mode="r", shape=(count + 1,))
+
+    def __len__(self):
+        return self._offsets.shape[0] - 1
+
+    def __getitem__(self, i):
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        # pread has no shared file position, so concurrent searches can read at once
+        return Document(**json.loads(os.pread(self._file.fileno(), end - start, start)))
+
+
+class LocalVectorStore(VectorStore):
+    """In-process cosine top-k search over a memory-mapped float32 matrix"""
+
+    def __init__(self, embedding, vectors, documents, path=LOCAL_INDEX_DIR):
+        self._embedding = embedding
+        self._vectors = vectors
+        self._documents = documents
+        self._path = path
+
+    @property
+    def embeddings(self):
+        return self._embedding
+
+    @classmethod
+    def load(cls, embedding, path=LOCAL_INDEX_DIR):
+        """Open an index written by store_index.py without copying it into memory"""
+        with open(os.path.join(path, META_FILE)) as f:
+            meta = json.load(f)
+
+        if meta["count"]:
+            vectors = np.memmap(
+                os.path.join(path, VECTORS_FILE),
+                dtype=np.float32,
+                mode="r",
+                shape=(meta["count"], meta["dim"])
+            )
+            documents = MappedDocuments(path, meta["count"])
+        else:
+            vectors = np.zeros((0, meta["dim"]), dtype=np.float32)
+            documents = []
+
+        return cls(embedding, vectors, documents, path)
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, path=LOCAL_INDEX_DIR, **kwargs):
+        """Build a new index at `path` holding only these texts"""
+        from src.ingestion import LocalIndexSink
+
+        sink = LocalIndexSink(path)
+        sink.reset()
+        sink.conn.close()
+        store = cls(embedding, np.zeros((0, 0), dtype=np.float32), [], path)
+        store.add_texts(texts, metadatas, **kwargs)
+        return store
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        """Embed texts into the index's chunk store, then rebuild the mapped files from it"""
+        # ingestion.py writes the index through this module
+        from src.ingestion import LocalIndexSink
+
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        ids = list(ids) if ids else [uuid.uuid4().hex for _ in texts]
+        chunks = [
+            Document(id=chunk_id, page_content=text, metadata=metadata)
+            for chunk_id, text, metadata in zip(ids, texts, metadatas)
+        ]
+
+        sink = LocalIndexSink(self._path, model_name=getattr(self._embedding, "model_name", None))
+        try:
+            if chunks:
+                sink.upsert(chunks, self._embedding.embed_documents(texts))
+            sink.finish()
+        finally:
+            sink.conn.close()
+
+        rebuilt = self.load(self._embedding, self._path)
+        self._vectors, self._documents = rebuilt._vectors, rebuilt._documents
+        return ids
+
+    def similarity_search_by_vector_with_score(self, embedding, k=4):
+        if not len(self._documents):
+            return []
+
+        query = _normalize(np.asarray(embedding, dtype=np.float32))
+        scores = self._vectors @ query
+        k = min(k, scores.shape[0])
+
+        # argpartition finds the top-k in O(n); only those k get sorted
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self._documents[i], float(scores[i])) for i in top]
+
+    def similarity_search_by_vector(self, embedding, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k)]
+
+    def similarity_search_with_score(self, query, k=4, **kwargs):
+        return self.similarity_search_by_vector_with_score(self._embedding.embed_query(query), k)
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def _select_relevance_score_fn(self):
+        # Scores are already cosine similarities
+        return lambda score: score
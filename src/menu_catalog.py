@@ -0,0 +1,233 @@
+import json
+import os
+import re
+import unicodedata
+from rapidfuzz import fuzz
+
+MENU_CATALOG_PATH = os.getenv("MENU_CATALOG_PATH", "artifacts/menu_catalog.json")
+
+# The dataset only has a price band per dish; these are the naira prices we charge
+PRICE_BY_RANGE = {"affordable": 1500, "moderate": 2500, "expensive": 4000}
+DEFAULT_PRICE = 1500
+
+# Words that don't identify a dish on their own ("egusi soup" -> alias "egusi")
+GENERIC_WORDS = {"soup", "stew", "rice", "sauce", "dish", "meal", "plate", "portion", "the", "with", "and"}
+
+# Words that say nothing about which dish is meant
+FILLER_WORDS = {"the", "a", "an", "some", "of", "please"}
+
+NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10, "a couple of": 2,
+}
+QUANTITY = re.compile(
+    r"^(?:(?P<number>\d+)\s*|(?P<word>" + "|".join(sorted(NUMBER_WORDS, key=len, reverse=True)) + r")\s+)"
+    r"(?:x\s+)?(?:(?:plates?|portions?|servings?|bowls?|packs?) of\s+)?(?P<name>.+)$",
+    re.IGNORECASE
+)
+SEPARATOR = re.compile(r",|\band\b|&|\+", re.IGNORECASE)
+PARENTHETICAL = re.compile(r"\([^)]*\)")
+
+
+def normalize(text):
+    """Lowercase, strip accents and punctuation, collapse whitespace"""
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+    text = re.sub(r"[^a-z0-9 ]+", " ", text.lower())
+    return " ".join(text.split())
+
+
+def _deletes(token):
+    """All strings one deletion away; two tokens within edit distance 1 share one"""
+    return {token[:i] + token[i + 1:] for i in range(len(token))} | {token}
+
+
+def describe_items(items):
+    """Human-readable cart line, e.g. '2 x Jollof Rice, Egusi Soup'"""
+    parts = []
+    for item in items:
+        if isinstance(item, str):
+            parts.append(item)
+        elif item.get("quantity", 1) > 1:
+            parts.append(f"{item['quantity']} x {item['name']}")
+        else:
+            parts.append(item["name"])
+    return ", ".join(parts)
+
+
+class MenuCatalog:
+    """Priced dishes with precomputed exact, alias and typo-tolerant token indexes"""
+
+    def __init__(self, items, max_candidates=200, min_score=70, min_coverage=0.66):
+        self.items = items
+        self.max_candidates = max_candidates
+        self.min_score = min_score
+        # Share of the typed words a dish has to account for ("it without pepper" isn't Pepper Soup)
+        self.min_coverage = min_coverage
+
+        self._exact = {}       # normalized full name -> item index
+        self._aliases = {}     # normalized alias -> item index
+        self._postings = {}    # token -> item indexes containing it
+        self._typos = {}       # deletion variant -> tokens it can come from
+        self._names = []       # normalized full names, parallel to items
+
+        for index, item in enumerate(items):
+            name = normalize(item["name"])
+            self._names.append(name)
+            self._exact.setdefault(name, index)
+            for alias in self._aliases_for(item):
+                # The plain dish wins an alias over its variants, e.g. "afang soup" over "afang soup spicy"
+                current = self._aliases.get(alias)
+                if current is None or len(self._names[current]) > len(name):
+                    self._aliases[alias] = index
+            for token in set(name.split()):
+                self._postings.setdefault(token, []).append(index)
+
+        for token in self._postings:
+            for variant in _deletes(token):
+                self._typos.setdefault(variant, set()).add(token)
+
+    @staticmethod
+    def _aliases_for(item):
+        aliases = {normalize(alias) for alias in item.get("aliases", [])}
+        base = normalize(PARENTHETICAL.sub("", item["name"]))
+        aliases.add(base)
+        specific = " ".join(word for word in base.split() if word not in GENERIC_WORDS)
+        if specific:
+            aliases.add(specific)
+        return aliases
+
+    @staticmethod
+    def item_from_row(row):
+        """Catalog item for one Nigerian-Dishes row (Food_Name, Price_Range, Food_Class, Region)"""
+        price_range = str(row.get("Price_Range") or "").strip().lower()
+        return {
+            "name": row["Food_Name"].strip(),
+            "price": PRICE_BY_RANGE.get(price_range, DEFAULT_PRICE),
+            "food_class": row.get("Food_Class"),
+            "region": row.get("Region"),
+        }
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build from Nigerian-Dishes rows"""
+        return cls([cls.item_from_row(row) for row in rows])
+
+    @classmethod
+    def load(cls, path=MENU_CATALOG_PATH):
+        """Load the catalog written by store_index.py; empty if it hasn't been built"""
+        try:
+            with open(path) as f:
+                return cls(json.load(f)["items"])
+        except FileNotFoundError:
+            return cls([])
+
+    def save(self, path=MENU_CATALOG_PATH):
+        writer = MenuCatalogWriter(path)
+        for item in self.items:
+            writer.add(item)
+        writer.commit()
+
+    def __len__(self):
+        return len(self.items)
+
+    def _correct(self, token):
+        """Vocabulary tokens within one edit of `token`"""
+        if token in self._postings:
+            return {token}
+        matches = set()
+        for variant in _deletes(token):
+            matches |= self._typos.get(variant, set())
+        return matches
+
+    def match(self, text):
+        """Best catalog item for a dish name as typed, or None"""
+        name = normalize(text)
+        if not name:
+            return None
+        index = self._exact.get(name)
+        if index is None:
+            index = self._aliases.get(name)
+        if index is not None:
+            return self.items[index]
+
+        words = [word for word in dict.fromkeys(name.split()) if word not in FILLER_WORDS]
+        if all(word in GENERIC_WORDS for word in words):
+            # "rice" or "soup" alone could be any of several dishes
+            return None
+
+        # Candidates come from the rarest (most specific) typed word that is in the menu
+        corrections = {word: self._correct(word) for word in words}
+        tokens = [token for word in words if word not in GENERIC_WORDS for token in corrections[word]]
+        typed = " ".join(words)
+        if not tokens:
+            return None
+        rarest = min(tokens, key=lambda token: len(self._postings[token]))
+        candidates = self._postings[rarest][:self.max_candidates]
+
+        best, best_score = None, self.min_score
+        for index in candidates:
+            dish_tokens = set(self._names[index].split())
+            covered = sum(1 for word in words if corrections[word] & dish_tokens)
+            if covered / len(words) < self.min_coverage:
+                continue
+            # Unlike token_set_ratio, words on either side that the other lacks lower the score
+            score = fuzz.token_sort_ratio(typed, self._names[index])
+            # Prefer the shorter (plain) dish when variants score the same
+            if score > best_score or (score == best_score and best is not None
+                                      and len(self._names[index]) < len(self._names[best])):
+                best, best_score = index, score
+        return self.items[best] if best is not None else None
+
+    def resolve(self, text):
+        """Turn "2 jollof and one egusi" into priced line items; also returns what didn't match"""
+        return self.resolve_parts(SEPARATOR.split(text))
+
+    def resolve_parts(self, parts):
+        line_items, unmatched = [], []
+        for part in parts:
+            part = part.strip(" .!?")
+            if not part:
+                continue
+            quantity, name = 1, part
+            quantity_match = QUANTITY.match(part)
+            if quantity_match:
+                if quantity_match.group("number"):
+                    quantity = int(quantity_match.group("number"))
+                else:
+                    quantity = NUMBER_WORDS[quantity_match.group("word").lower()]
+                name = quantity_match.group("name")
+
+            item = self.match(name)
+            if item is None:
+                unmatched.append(part)
+                continue
+            line_items.append({
+                "name": item["name"],
+                "quantity": quantity,
+                "unit_price": item["price"],
+            })
+        return line_items, unmatched
+
+
+class MenuCatalogWriter:
+    """Writes the file MenuCatalog.load reads one item at a time, so ingestion never holds them all"""
+
+    def __init__(self, path=MENU_CATALOG_PATH):
+        self.path = path
+        self.count = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = open(path + ".tmp", "w")
+        self._file.write('{"items": [')
+
+    def add(self, item):
+        self._file.write((", " if self.count else "") + json.dumps(item))
+        self.count += 1
+
+    def commit(self):
+        self._file.write("]}")
+        self._file.close()
+        os.replace(self.path + ".tmp", self.path)
+
+    def discard(self):
+        self._file.close()
+        os.remove(self.path + ".tmp")
@@ -0,0 +1,260 @@
+import asyncio
+import contextvars
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from src.payment_handler import payment_handler
+from src.tracing import bind, metrics
+
+OUTBOX_DB_PATH = os.getenv("OUTBOX_DB_PATH", "artifacts/outbox.db")
+
+
+class NotificationOutbox:
+    """Persistent queue of owner notifications drained by background workers
+
+    Orders are confirmed as soon as their notification is written to the
+    outbox; delivery happens later, with retries, and survives restarts.
+    """
+
+    def __init__(self, render, send, db_path=OUTBOX_DB_PATH, workers=2, max_attempts=5,
+                 backoff_base=2.0, batch_window=0.0, batch_max=10):
+        self.render = render              # async (order_data, payment_data) -> message text
+        self.send = send                  # async (text) -> message id, raises on failure
+        self.db_path = db_path
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.batch_window = batch_window  # seconds to wait for more orders to digest; 0 disables
+        self.batch_max = batch_max
+        # A 'sending' row whose claim is older than this is presumed abandoned by a dead process
+        self.claim_seconds = 300
+        # How often running workers look for such rows
+        self.reclaim_interval = 60
+
+        self._lock = threading.Lock()
+        self._conn = None
+        self._queue = None
+        self._started = None
+        self._tasks = []
+        self._timers = {}
+
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self._send_seconds = 0.0
+        self._send_count = 0
+        self._last_send_seconds = None
+
+    def _db(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    created_at REAL NOT NULL,
+                    claimed_at REAL
+                )
+            """)
+            try:
+                self._conn.execute("ALTER TABLE outbox ADD COLUMN claimed_at REAL")
+            except sqlite3.OperationalError:
+                pass  # Column already exists
+            self._conn.execute("CREATE INDEX IF NOT EXISTS outbox_status ON outbox (status)")
+        return self._conn
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._db().execute(sql, params).fetchall()
+
+    def _insert(self, payload):
+        with self._lock:
+            cursor = self._db().execute(
+                "INSERT INTO outbox (payload, created_at) VALUES (?, ?)",
+                (json.dumps(payload), time.time())
+            )
+            return cursor.lastrowid
+
+    async def start(self):
+        """Start the workers and requeue anything left pending by a previous run"""
+        if self._started is None:
+            self._started = asyncio.Event()
+            self._queue = asyncio.Queue()
+            await self._requeue_rows("status = 'pending' OR (status = 'sending' AND claimed_at < ?)")
+            # A fresh context each, so workers don't carry the IDs of the session that started them
+            self._tasks = [
+                asyncio.create_task(self._worker(), context=contextvars.Context()) for _ in range(self.workers)
+            ]
+            self._tasks.append(asyncio.create_task(self._reclaimer(), context=contextvars.Context()))
+            self._started.set()
+        await self._started.wait()
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # Rows waiting out a retry backoff are 'pending' in the outbox, so the next start() picks them up
+        for handle in self._timers.values():
+            handle.cancel()
+        self._timers = {}
+        self._queue = None
+        self._started = None
+
+    async def _requeue_rows(self, where):
+        """Queue the outbox rows matching `where`, whose one parameter is the stale-claim cutoff"""
+        rows = await asyncio.to_thread(
+            self._execute,
+            f"SELECT id, payload, attempts FROM outbox WHERE {where} ORDER BY id",
+            (time.time() - self.claim_seconds,)
+        )
+        for row_id, payload, attempts in rows:
+            self._queue.put_nowait((row_id, json.loads(payload), attempts))
+
+    async def _reclaimer(self):
+        """Requeue rows left 'sending' by a worker or process that died mid-delivery"""
+        while True:
+            await asyncio.sleep(self.reclaim_interval)
+            await self._requeue_rows("status = 'sending' AND claimed_at < ?")
+
+    async def enqueue(self, order_data, payment_data):
+        """Persist a notification and return immediately"""
+        await self.start()
+        payload = {"order_data": order_data, "payment_data": payment_data}
+        row_id = await asyncio.to_thread(self._insert, payload)
+        self._queue.put_nowait((row_id, payload, 0))
+        return row_id
+
+    async def _next_batch(self):
+        batch = [await self._queue.get()]
+        if self.batch_window > 0:
+            deadline = time.monotonic() + self.batch_window
+            while len(batch) < self.batch_max:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+        return batch
+
+    async def _deliver(self, batch):
+        bind(order_id=",".join(str(payload["order_data"].get("order_id")) for _, payload, _ in batch))
+        texts = [await self.render(**payload) for _, payload, _ in batch]
+        if len(texts) == 1:
+            return await self.send(texts[0])
+        digest = f"🚨 {len(texts)} NEW ORDERS 🚨\n\n" + "\n\n---\n\n".join(texts)
+        return await self.send(digest)
+
+    def _claim(self, row_id):
+        """Take ownership of a row so other app processes sharing the outbox skip it"""
+        now = time.time()
+        with self._lock:
+            cursor = self._db().execute(
+                "UPDATE outbox SET status = 'sending', claimed_at = ? WHERE id = ? "
+                "AND (status = 'pending' OR (status = 'sending' AND claimed_at < ?))",
+                (now, row_id, now - self.claim_seconds)
+            )
+            return cursor.rowcount == 1
+
+    async def _worker(self):
+        while True:
+            batch = await self._next_batch()
+            claimed = []
+            for item in batch:
+                if await asyncio.to_thread(self._claim, item[0]):
+                    claimed.append(item)
+                else:
+                    self._queue.task_done()
+            batch = claimed
+            if not batch:
+                continue
+            started = time.perf_counter()
+            try:
+                await self._deliver(batch)
+            except Exception as e:
+                for item in batch:
+                    await self._retry_later(item, e)
+            else:
+                elapsed = time.perf_counter() - started
+                self._send_seconds += elapsed
+                self._send_count += 1
+                self._last_send_seconds = elapsed
+                self.sent += len(batch)
+                ids = [row_id for row_id, _, _ in batch]
+                await asyncio.to_thread(
+                    self._execute,
+                    f"UPDATE outbox SET status = 'sent' WHERE id IN ({','.join('?' * len(ids))})",
+                    ids
+                )
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _retry_later(self, item, error):
+        row_id, payload, attempts = item
+        attempts += 1
+        if attempts >= self.max_attempts:
+            self.failed += 1
+            await asyncio.to_thread(
+                self._execute,
+                "UPDATE outbox SET status = 'failed', attempts = ?, last_error = ? WHERE id = ?",
+                (attempts, str(error), row_id)
+            )
+            print(f"Owner notification {row_id} failed after {attempts} attempts: {error}")
+            return
+
+        self.retries += 1
+        await asyncio.to_thread(
+            self._execute,
+            "UPDATE outbox SET status = 'pending', attempts = ?, last_error = ? WHERE id = ?",
+            (attempts, str(error), row_id)
+        )
+        delay = self.backoff_base * 2 ** (attempts - 1) * random.uniform(0.5, 1.0)
+        self._timers[row_id] = asyncio.get_running_loop().call_later(
+            delay, self._requeue, (row_id, payload, attempts)
+        )
+
+    def _requeue(self, item):
+        self._timers.pop(item[0], None)
+        if self._queue is not None:
+            self._queue.put_nowait(item)
+
+    async def drain(self):
+        """Wait until everything currently queued has been attempted"""
+        if self._queue is not None:
+            await self._queue.join()
+
+    def stats(self):
+        return {
+            "queue_depth": (self._queue.qsize() if self._queue else 0) + len(self._timers),
+            "sent": self.sent,
+            "failed": self.failed,
+            "retries": self.retries,
+            "avg_send_seconds": round(self._send_seconds / self._send_count, 4) if self._send_count else None,
+            "last_send_seconds": self._last_send_seconds,
+        }
+
+
+# Global notification outbox instance
+notification_outbox = NotificationOutbox(
+    render=payment_handler.create_twilio_notification,
+    send=payment_handler.send_whatsapp_message,
+    workers=int(os.getenv("OUTBOX_WORKERS", "2")),
+    max_attempts=int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5")),
+    batch_window=float(os.getenv("OUTBOX_BATCH_WINDOW_SECONDS", "0")),
+    batch_max=int(os.getenv("OUTBOX_BATCH_MAX", "10"))
+)
+metrics.gauge(
+    "dishdash_outbox_queue_depth", "Owner notifications waiting to be sent",
+    lambda: notification_outbox.stats()["queue_depth"]
+)
@@ -1,17 +1,37 @@
+import asyncio
 import chainlit as cl
 from src.payment_handler import payment_handler  
-import json
+from src.notification_outbox import notification_outbox
+from src.checkout_pipeline import CheckoutPipeline, Stage
+from src.order_store import OrderIdGenerator, create_order_store
+from src.menu_catalog import DEFAULT_PRICE, describe_items
+from src.tracing import bind, metrics
+import re
 from datetime import datetime
-from langchain_groq import ChatGroq
-import os
+
+ITEM_PREFIX = re.compile(
+    r"^(please\s+)?(can i (get|have)|i(?:'d| would) like( to order)?|i want( to order)?|i(?:'ll| will) (have|take)|get me|add|order|buy)(\s+|$)(the\s+|some\s+)?",
+    re.IGNORECASE
+)
+ITEM_SUFFIX = re.compile(r"\s*(to|in|into) (my |the )?cart\b.*$|\s*please[.!]*$", re.IGNORECASE)
+ITEM_SEPARATOR = re.compile(r",|\band\b|&|\+", re.IGNORECASE)
 
 class OrderManager:
-    def __init__(self):
-        self.orders = {}
+    def __init__(self, order_store=None):
+        self.orders = order_store or create_order_store()
+        self.generate_order_id = OrderIdGenerator()
+        self.checkout_pipeline = CheckoutPipeline([
+            Stage("confirm_order", self._confirm_order_stage, timeout=1),
+            Stage("notify_owner", self._notify_owner_stage, depends_on=["confirm_order"], timeout=2, required=False),
+            Stage("summary", self._summary_stage, depends_on=["confirm_order"], timeout=8, fallback=self._template_summary_stage),
+            Stage("clear_cart", self._clear_cart_stage, depends_on=["confirm_order"], timeout=1),
+            Stage("send_confirmation", self._send_confirmation_stage, depends_on=["summary", "clear_cart"], timeout=10)
+        ])
     
     async def create_order(self, user_session, order_items, customer_info):
         """Create a new order"""
-        order_id = f"DD{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        order_id = self.generate_order_id()
+        bind(order_id=order_id)
         
         order_data = {
             "order_id": order_id,
@@ -22,15 +42,34 @@ class OrderManager:
             "total_amount": self.calculate_total(order_items)
         }
         
-        self.orders[order_id] = order_data
+        self.orders.save(order_data)
         user_session.set("current_order", order_data)
         
         return order_data
     
+    def get_order(self, order_id):
+        return self.orders.get(order_id)
+    
+    def find_order_by_reference(self, reference):
+        return self.orders.get_by_reference(reference)
+    
+    @staticmethod
+    def parse_items(text):
+        """Pull dish names out of a message like 'add jollof rice and 2 egusi please'"""
+        text = ITEM_PREFIX.sub("", text.strip())
+        text = ITEM_SUFFIX.sub("", text)
+        return [item.strip(" .!?") for item in ITEM_SEPARATOR.split(text) if item.strip(" .!?")]
+    
     def calculate_total(self, order_items):
-        """Calculate order total (simplified - you'd have actual prices)"""
-        base_price = len(order_items) * 1500  # Assuming average dish price
-        return base_price
+        """Sum quantity x unit price over the cart's priced line items"""
+        total = 0
+        for item in order_items:
+            if isinstance(item, str):
+                # Carts saved before items were priced
+                total += DEFAULT_PRICE
+            else:
+                total += item.get("quantity", 1) * item.get("unit_price", DEFAULT_PRICE)
+        return total
     
     async def process_payment(self, order_data, user_session):
         """Process payment for order"""
@@ -48,8 +87,12 @@ class OrderManager:
             )
             
             if payment_result["success"]:
-                # Store payment reference in session
+                # Store payment reference in session and index the order by it
                 user_session.set("payment_reference", payment_result["reference"])
+                order_data["payment_reference"] = payment_result["reference"]
+                # Lets the payment webhook find the customer's open session
+                order_data["session_id"] = user_session.get("id")
+                self.orders.save(order_data)
                 
                 # Send payment link to user
                 actions = [
@@ -87,54 +130,110 @@ Please click the button below to complete your payment:""",
             ).send()
             return False
     
+    def claim_completion(self, reference):
+        """True for the one caller, across every worker sharing the order store, that gets to complete this order"""
+        return self.orders.claim(reference)
+    
+    def release_completion(self, reference):
+        self.orders.release(reference)
+    
+    async def complete_order(self, reference, verification, order_data, user_session=None):
+        """Confirm a paid order; with a session, also summarise it to the customer
+        
+        Callers must hold the claim from claim_completion; it is released if completion fails.
+        """
+        ctx = {"reference": reference, "verification": verification, "order_data": order_data}
+        try:
+            if user_session is None:
+                ctx["confirm_order"] = await self._confirm_order_stage(ctx)
+                await self._notify_owner_stage(ctx)
+            else:
+                # The confirmation only waits on the stages it needs; the owner
+                # notification is optional and runs alongside them
+                await self.checkout_pipeline.run({**ctx, "user_session": user_session})
+        except BaseException:
+            # A confirmed order stays claimed; only an unfinished one goes back to pending
+            self.release_completion(reference)
+            raise
+    
     async def verify_and_complete_order(self, reference, user_session):
         """Verify payment and complete order"""
+        current_order = user_session.get("current_order")
+        if current_order:
+            bind(order_id=current_order["order_id"])
+        
+        # The payment webhook may have got there first
+        order_data = self.find_order_by_reference(reference) or current_order
+        if order_data is not None and order_data.get("status") == "confirmed":
+            await cl.Message(content=f"✅ Your payment was received and order {order_data['order_id']} is confirmed.").send()
+            return True
+        
         verification = await payment_handler.verify_payment(reference)
         
         if verification["success"]:
-            order_data = user_session.get("current_order")
-            
-            # Update order status
-            order_data["status"] = "confirmed"
-            order_data["payment_reference"] = reference
-            order_data["paid_at"] = datetime.now().isoformat()
-            
-            # ✅ CORRECTED - Use the proper method name
-            await payment_handler.send_twilio_notification(
-                order_data=order_data,
-                payment_data=verification["data"]
-            )
-            
-            # Create order summary
-            summary = await payment_handler.create_order_summary({
-                "customer_name": order_data["customer_info"].get("name", "Customer"),
-                "phone_number": order_data["customer_info"].get("phone", "N/A"),
-                "location": order_data["customer_info"].get("location", "N/A"),
-                "order_items": ", ".join(order_data["items"]),
-                "special_instructions": order_data["customer_info"].get("instructions", "None"),
-                "order_total": order_data["total_amount"]
-            })
-            
-            # Clear cart
-            user_session.set("order_cart", [])
-            
+            if not self.claim_completion(reference):
+                await cl.Message(content="✅ Payment received! Your order is being confirmed.").send()
+                return True
+            await self.complete_order(reference, verification, order_data, user_session)
+            return True
+        else:
             await cl.Message(
-                content=f"""🎉 **Order Confirmed!** 🎉
+                content=f"❌ Payment verification failed: {verification['message']}"
+            ).send()
+            return False
+    
+    async def _confirm_order_stage(self, ctx):
+        """Mark the order paid and flatten the fields the messages need"""
+        order_data = ctx["order_data"]
+        
+        # Update order status
+        order_data["status"] = "confirmed"
+        order_data["payment_reference"] = ctx["reference"]
+        order_data["paid_at"] = datetime.now().isoformat()
+        self.orders.save(order_data)
+        
+        return {
+            "customer_name": order_data["customer_info"].get("name", "Customer"),
+            "phone_number": order_data["customer_info"].get("phone", "N/A"),
+            "location": order_data["customer_info"].get("location", "N/A"),
+            "order_items": describe_items(order_data["items"]),
+            "special_instructions": order_data["customer_info"].get("instructions", "None"),
+            "order_total": order_data["total_amount"]
+        }
+    
+    async def _notify_owner_stage(self, ctx):
+        # Owner notification is delivered in the background by the outbox. Shielded, so the
+        # stage timeout can't cancel it between the outbox insert and queueing the delivery
+        return await asyncio.shield(notification_outbox.enqueue(
+            order_data=ctx["confirm_order"],
+            payment_data={
+                "status": ctx["verification"]["data"].get("status", "confirmed"),
+                "reference": ctx["reference"]
+            }
+        ))
+    
+    async def _summary_stage(self, ctx):
+        return await payment_handler.create_order_summary(ctx["confirm_order"])
+    
+    async def _template_summary_stage(self, ctx):
+        # A slow or failed LLM summary falls back to the fixed layout
+        return await payment_handler.create_order_summary(ctx["confirm_order"], render_mode="template")
+    
+    async def _clear_cart_stage(self, ctx):
+        ctx["user_session"].set("order_cart", [])
+    
+    async def _send_confirmation_stage(self, ctx):
+        await cl.Message(
+            content=f"""🎉 **Order Confirmed!** 🎉
 
-{summary}
+{ctx["summary"]}
 
 📱 You will receive a confirmation message shortly.
 ⏱️ Your food will be delivered within 30-45 minutes.
 
 Thank you for choosing DishDash!"""
-            ).send()
-            
-            return True
-        else:
-            await cl.Message(
-                content=f"❌ Payment verification failed: {verification['message']}"
-            ).send()
-            return False
+        ).send()
 
 # Global order manager instance
-order_manager = OrderManager()
\ No newline at end of file
+order_manager = OrderManager()
+metrics.gauge("dishdash_orders_unwritten", "Orders saved but not yet written to the order store", lambda: order_manager.orders.unwritten())
@@ -0,0 +1,331 @@
+import json
+import os
+import queue
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from src.tracing import metrics
+
+ORDER_DB_PATH = os.getenv("ORDER_DB_PATH", "artifacts/orders.db")
+
+# A failed batch is retried with backoff doubling up to this; its orders stay readable meanwhile
+WRITE_RETRY_MAX_SECONDS = float(os.getenv("ORDER_WRITE_RETRY_MAX_SECONDS", "30"))
+# Attempts at a failed batch once close() has been called, before giving up on it
+CLOSE_WRITE_ATTEMPTS = 3
+
+write_failures = metrics.counter("dishdash_order_store_write_failures_total", "Order batches the store failed to write")
+
+
+class OrderIdGenerator:
+    """Collision-free order IDs: DD<timestamp><per-second sequence><process node>
+
+    The sequence restarts every second and never goes backwards with the
+    clock; the random node suffix keeps IDs from separate processes apart.
+    """
+
+    def __init__(self, prefix="DD"):
+        self.prefix = prefix
+        self.node = secrets.token_hex(2)
+        self._lock = threading.Lock()
+        self._stamp = ""
+        self._seq = 0
+
+    def __call__(self):
+        with self._lock:
+            stamp = datetime.now().strftime('%Y%m%d%H%M%S')
+            if stamp > self._stamp:
+                self._stamp, self._seq = stamp, 0
+            else:
+                self._seq += 1
+            return f"{self.prefix}{self._stamp}{self._seq:05d}{self.node}"
+
+
+class OrderStore:
+    """Interface for order persistence used by OrderManager"""
+
+    def save(self, order_data):
+        raise NotImplementedError
+
+    def get(self, order_id):
+        raise NotImplementedError
+
+    def get_by_reference(self, reference):
+        raise NotImplementedError
+
+    def list_by_status(self, status, limit=100):
+        raise NotImplementedError
+
+    def claim(self, reference):
+        """Move the pending order paid under `reference` to confirming; True for exactly one caller"""
+        raise NotImplementedError
+
+    def release(self, reference):
+        """Undo a claim whose completion failed, so another attempt can make it"""
+        raise NotImplementedError
+
+    def flush(self):
+        """Block until every saved order is durable"""
+
+    def unwritten(self):
+        """Orders saved but not yet durable"""
+        return 0
+
+    def close(self):
+        self.flush()
+
+
+class InMemoryOrderStore(OrderStore):
+    """Process-local store; orders are lost on restart"""
+
+    def __init__(self):
+        self._orders = {}
+        self._by_reference = {}
+        self._claimed = set()
+        self._claim_lock = threading.Lock()
+
+    def save(self, order_data):
+        self._orders[order_data["order_id"]] = order_data
+        if order_data.get("payment_reference"):
+            self._by_reference[order_data["payment_reference"]] = order_data["order_id"]
+
+    def get(self, order_id):
+        return self._orders.get(order_id)
+
+    def get_by_reference(self, reference):
+        order_id = self._by_reference.get(reference)
+        return self._orders.get(order_id) if order_id else None
+
+    def list_by_status(self, status, limit=100):
+        matches = [order for order in self._orders.values() if order.get("status") == status]
+        return sorted(matches, key=lambda order: order["created_at"], reverse=True)[:limit]
+
+    def claim(self, reference):
+        with self._claim_lock:
+            order = self.get_by_reference(reference)
+            if order is None or order.get("status") != "pending" or reference in self._claimed:
+                return False
+            self._claimed.add(reference)
+            return True
+
+    def release(self, reference):
+        with self._claim_lock:
+            self._claimed.discard(reference)
+
+
+class SQLiteOrderStore(OrderStore):
+    """Embedded SQLite (WAL) store with a bounded hot cache and batched background writes"""
+
+    def __init__(self, path=ORDER_DB_PATH, cache_size=2048, batch_size=500):
+        self.path = path
+        self.cache_size = cache_size
+        self.batch_size = batch_size
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._local = threading.local()
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # Saved but not yet written; keeps reads consistent with writes in flight
+        self._pending = {}
+        self._pending_references = {}
+        self._pending_lock = threading.Lock()
+        self.write_failures = 0
+
+        conn = self._connection()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS orders (
+                order_id TEXT PRIMARY KEY,
+                payment_reference TEXT,
+                status TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS orders_payment_reference ON orders (payment_reference);
+            CREATE INDEX IF NOT EXISTS orders_status ON orders (status, created_at);
+            CREATE INDEX IF NOT EXISTS orders_created_at ON orders (created_at);
+        """)
+
+        self._writes = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    def _connection(self):
+        """One connection per thread; WAL lets readers run alongside the writer"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _cache_put(self, order_data):
+        with self._cache_lock:
+            self._cache[order_data["order_id"]] = order_data
+            self._cache.move_to_end(order_data["order_id"])
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def save(self, order_data):
+        """Cache the order and queue it for the writer thread; returns immediately"""
+        row = (
+            order_data["order_id"],
+            order_data.get("payment_reference"),
+            order_data.get("status", "pending"),
+            order_data.get("created_at") or datetime.now().isoformat(),
+            json.dumps(order_data),
+        )
+        self._cache_put(order_data)
+        with self._pending_lock:
+            self._pending[order_data["order_id"]] = (row, order_data)
+            if row[1]:
+                self._pending_references[row[1]] = order_data["order_id"]
+        self._writes.put(row)
+
+    def _write_loop(self):
+        conn = self._connection()
+        while True:
+            batch = [self._writes.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+
+            rows = [row for row in batch if row is not None]
+            # Until written, the rows stay in _pending, so reads still find them
+            if self._write_with_retry(conn, rows, closing=None in batch):
+                with self._pending_lock:
+                    for row in rows:
+                        pending = self._pending.get(row[0])
+                        # Only drop it if no newer save arrived while we were writing
+                        if pending is not None and pending[0] is row:
+                            del self._pending[row[0]]
+                            if row[1] and self._pending_references.get(row[1]) == row[0]:
+                                del self._pending_references[row[1]]
+            for _ in batch:
+                self._writes.task_done()
+            if None in batch:
+                return
+
+    def _write_with_retry(self, conn, rows, closing=False):
+        """Write a batch, retrying with backoff until it sticks; False only if given up on at close"""
+        attempts, delay = 0, 0.1
+        while True:
+            try:
+                with conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO orders (order_id, payment_reference, status, created_at, data) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        rows
+                    )
+                if attempts:
+                    print(f"Order store write of {len(rows)} orders succeeded after {attempts} failed attempts")
+                return True
+            except sqlite3.Error as e:
+                attempts += 1
+                self.write_failures += 1
+                write_failures.inc()
+                if closing and attempts >= CLOSE_WRITE_ATTEMPTS:
+                    print(f"Order store closing with {self.unwritten()} orders unwritten: {e}")
+                    return False
+                # Report the first failure and then each time the backoff is at its ceiling
+                if attempts == 1 or delay >= WRITE_RETRY_MAX_SECONDS:
+                    print(f"Order store write of {len(rows)} orders failed ({attempts} attempts), "
+                          f"{self.unwritten()} orders unwritten; retrying in {delay:.1f}s: {e}")
+                time.sleep(delay)
+                delay = min(delay * 2, WRITE_RETRY_MAX_SECONDS)
+
+    def unwritten(self):
+        with self._pending_lock:
+            return len(self._pending)
+
+    def _pending_order(self, order_id):
+        with self._pending_lock:
+            pending = self._pending.get(order_id)
+            return pending[1] if pending else None
+
+    def get(self, order_id):
+        with self._cache_lock:
+            order = self._cache.get(order_id)
+            if order is not None:
+                self._cache.move_to_end(order_id)
+                return order
+        pending = self._pending_order(order_id)
+        if pending is not None:
+            return pending
+
+        row = self._connection().execute(
+            "SELECT data FROM orders WHERE order_id = ?", (order_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        order = json.loads(row[0])
+        self._cache_put(order)
+        return order
+
+    def get_by_reference(self, reference):
+        with self._pending_lock:
+            order_id = self._pending_references.get(reference)
+        if order_id is not None:
+            return self.get(order_id)
+
+        row = self._connection().execute(
+            "SELECT order_id FROM orders WHERE payment_reference = ?", (reference,)
+        ).fetchone()
+        return self.get(row[0]) if row else None
+
+    def list_by_status(self, status, limit=100):
+        self.flush()
+        rows = self._connection().execute(
+            "SELECT data FROM orders WHERE status = ? ORDER BY created_at DESC LIMIT ?", (status, limit)
+        ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def claim(self, reference):
+        """One conditional UPDATE, so workers sharing the database can't both claim an order
+
+        Reads the row, not the hot cache, which other workers' writes don't reach.
+        """
+        # The order's latest save may still be queued for the writer
+        self.flush()
+        conn = self._connection()
+        with conn:
+            cursor = conn.execute(
+                "UPDATE orders SET status = 'confirming' WHERE payment_reference = ? AND status = 'pending'",
+                (reference,)
+            )
+        return cursor.rowcount == 1
+
+    def release(self, reference):
+        # A confirmation saved before the failure must land first, or this would undo it
+        self.flush()
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "UPDATE orders SET status = 'pending' WHERE payment_reference = ? AND status = 'confirming'",
+                (reference,)
+            )
+
+    def count(self):
+        self.flush()
+        return self._connection().execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+
+    def flush(self):
+        self._writes.join()
+
+    def close(self):
+        self._writes.put(None)
+        self._writer.join()
+
+
+def create_order_store(kind=None):
+    """Build the store selected by ORDER_STORE ("sqlite" by default, or "memory")"""
+    kind = kind or os.getenv("ORDER_STORE", "sqlite")
+    if kind == "memory":
+        return InMemoryOrderStore()
+    if kind == "sqlite":
+        return SQLiteOrderStore()
+    raise ValueError(f"Unknown ORDER_STORE: {kind}")
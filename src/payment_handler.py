@@ -1,18 +1,98 @@
-import requests
+import asyncio
+import random
+import time
+import httpx
 import json
 import os
+from collections import OrderedDict
 import chainlit as cl
-from langchain_groq import ChatGroq
-from src.prompt import ORDER_SUMMARY_PROMPT, TWILIO_NOTIFICATION_PROMPT 
-from twilio.rest import Client
+from src.llm_pool import llm_pool
+from src.tracing import metrics, traced
+from src.prompt import ORDER_SUMMARY_PROMPT, TWILIO_NOTIFICATION_PROMPT, ORDER_SUMMARY_TEMPLATE, TWILIO_NOTIFICATION_TEMPLATE
+
+# Transaction statuses that won't change, so their verification can be reused
+TERMINAL_STATUS = {"success", "failed"}
+
+verify_requests = metrics.counter("dishdash_paystack_verify_total", "Payment verifications, by how they were answered")
 
 class PaymentHandler:
-    def __init__(self):
+    def __init__(self, base_url=None, transport=None):
         self.paystack_secret_key = os.getenv('PAYSTACK_SECRET_KEY')
         self.paystack_public_key = os.getenv('PAYSTACK_PUBLIC_KEY')
-        self.base_url = "https://api.paystack.co"
-        self.twilio_client = Client(os.getenv('TWILIO_ACCOUNT_SID'), os.getenv('TWILIO_AUTH_TOKEN'))
+        self.base_url = base_url or os.getenv("PAYSTACK_BASE_URL", "https://api.paystack.co")
+        self.timeout = float(os.getenv("PAYSTACK_TIMEOUT_SECONDS", "10"))
+        self.max_retries = int(os.getenv("PAYSTACK_MAX_RETRIES", "3"))
+        self.backoff_base = 0.25
+        # "template" fills the fixed layouts directly; "llm" has the model polish them
+        self.render_mode = os.getenv("ORDER_RENDER_MODE", "template")
+        self._transport = transport
+        self._client = None
+        self._twilio_client = None
+        # Per-reference single flight, plus terminal results kept for a while
+        self.verify_cache_seconds = float(os.getenv("PAYSTACK_VERIFY_CACHE_SECONDS", "600"))
+        self._verifying = {}
+        self._verified = OrderedDict()
+    
+    @property
+    def twilio_client(self):
+        """Built on the first notification, so startup never imports the Twilio SDK"""
+        if self._twilio_client is None:
+            from twilio.rest import Client
+            self._twilio_client = Client(os.getenv('TWILIO_ACCOUNT_SID'), os.getenv('TWILIO_AUTH_TOKEN'))
+        return self._twilio_client
+    
+    @twilio_client.setter
+    def twilio_client(self, client):
+        self._twilio_client = client
+    
+    def _get_client(self):
+        """Pooled keep-alive client shared by every Paystack call"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={
+                    "Authorization": f"Bearer {self.paystack_secret_key}",
+                    "Content-Type": "application/json"
+                },
+                timeout=httpx.Timeout(self.timeout, connect=5.0),
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30),
+                transport=self._transport
+            )
+        return self._client
+    
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    async def _request(self, method, path, timeout=None, **kwargs):
+        """Send a Paystack request with bounded, jittered retries
+
+        GETs are retried on any timeout or 5xx. POSTs are retried only when the
+        connection was never made; any response, even a gateway 5xx, may come
+        from a request Paystack processed, so a retry could duplicate it.
+        """
+        client = self._get_client()
+        idempotent = method == "GET"
+
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            try:
+                response = await client.request(method, path, timeout=timeout or self.timeout, **kwargs)
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout):
+                if last_attempt:
+                    raise
+            except (httpx.TimeoutException, httpx.RemoteProtocolError):
+                if last_attempt or not idempotent:
+                    raise
+            else:
+                if not idempotent or response.status_code < 500 or last_attempt:
+                    return response
+
+            # Full jitter keeps a burst of failed calls from retrying in lockstep
+            await asyncio.sleep(random.uniform(0, self.backoff_base * 2 ** attempt))
     
+    @traced("paystack_initialize")
     async def initialize_payment(self, email, amount, order_data, metadata=None):
         """Initialize Paystack payment"""
         try:
@@ -32,14 +112,9 @@ class PaymentHandler:
             payment_data["metadata"]["order_data"] = json.dumps(order_data)
             
             # Make API request to Paystack
-            headers = {
-                "Authorization": f"Bearer {self.paystack_secret_key}",
-                "Content-Type": "application/json"
-            }
-            
-            response = requests.post(
-                f"{self.base_url}/transaction/initialize",
-                headers=headers,
+            response = await self._request(
+                "POST",
+                "/transaction/initialize",
                 json=payment_data
             )
             
@@ -61,90 +136,118 @@ class PaymentHandler:
             return {"success": False, "message": str(e)}
     
     async def verify_payment(self, reference):
-        """Verify Paystack payment"""
+        """Verify Paystack payment
+        
+        Concurrent calls for one reference share a single Paystack request, and a
+        success or failure is remembered for verify_cache_seconds, so double clicks,
+        retries and other tabs don't each go upstream.
+        """
+        cached = self._verified.get(reference)
+        if cached is not None and cached[0] > time.monotonic():
+            verify_requests.inc(outcome="cached")
+            return cached[1]
+        
+        task = self._verifying.get(reference)
+        if task is not None:
+            verify_requests.inc(outcome="coalesced")
+        else:
+            verify_requests.inc(outcome="upstream")
+            task = asyncio.ensure_future(self._verify_upstream(reference))
+            self._verifying[reference] = task
+            task.add_done_callback(lambda _: self._verifying.pop(reference, None))
+        # Shielded so one caller giving up doesn't cancel the request for the others
+        result = await asyncio.shield(task)
+        
+        if result.get("payment_status") in TERMINAL_STATUS:
+            self._remember(reference, result)
+        return result
+    
+    def _remember(self, reference, result):
+        now = time.monotonic()
+        self._verified[reference] = (now + self.verify_cache_seconds, result)
+        self._verified.move_to_end(reference)
+        # Entries share one TTL, so the expired ones are always at the front
+        while self._verified and next(iter(self._verified.values()))[0] <= now:
+            self._verified.popitem(last=False)
+    
+    @traced("paystack_verify")
+    async def _verify_upstream(self, reference):
         try:
-            headers = {
-                "Authorization": f"Bearer {self.paystack_secret_key}",
-                "Content-Type": "application/json"
-            }
-            
-            response = requests.get(
-                f"{self.base_url}/transaction/verify/{reference}",
-                headers=headers
+            response = await self._request(
+                "GET",
+                f"/transaction/verify/{reference}"
             )
             
             if response.status_code == 200:
                 result = response.json()
-                if result["status"] and result["data"]["status"] == "success":
+                payment_status = (result.get("data") or {}).get("status")
+                if result["status"] and payment_status == "success":
                     return {
                         "success": True,
                         "data": result["data"],
+                        "payment_status": payment_status,
                         "message": "Payment verified successfully"
                     }
                 else:
-                    return {"success": False, "message": "Payment verification failed"}
+                    return {"success": False, "payment_status": payment_status, "message": "Payment verification failed"}
             else:
                 return {"success": False, "message": "Verification request failed"}
                 
         except Exception as e:
             return {"success": False, "message": str(e)}
     
-    async def create_order_summary(self, order_data):
-        """Create order summary using LLM"""
-        # Proper LLM initialization
-        llm = ChatGroq(
-            groq_api_key=os.getenv("GROQ_API_KEY"),
-            model_name="llama-3.1-70b-versatile",
-            temperature=0.3
-        )
+    @staticmethod
+    def _layout_fields(order_data, payment_data=None):
+        """Order fields with the defaults both the template and LLM layouts expect"""
+        fields = {
+            "customer_name": order_data.get('customer_name', 'Customer'),
+            "phone_number": order_data.get('phone_number', 'N/A'),
+            "location": order_data.get('location', 'N/A'),
+            "order_items": order_data.get('order_items', 'N/A'),
+            "special_instructions": order_data.get('special_instructions', 'None'),
+            "order_total": order_data.get('order_total', '0')
+        }
+        if payment_data is not None:
+            fields["payment_status"] = payment_data.get('status', 'confirmed')
+        return fields
+    
+    @traced("order_summary")
+    async def create_order_summary(self, order_data, render_mode=None):
+        """Create order summary from the fixed layout, or polished by the LLM"""
+        fields = self._layout_fields(order_data)
+        if (render_mode or self.render_mode) == "template":
+            return ORDER_SUMMARY_TEMPLATE.format(**fields)
         
-        # Use proper async method
-        summary = await llm.ainvoke(
-            ORDER_SUMMARY_PROMPT.format(
-                customer_name=order_data.get('customer_name', 'Customer'),
-                phone_number=order_data.get('phone_number', 'N/A'),
-                location=order_data.get('location', 'N/A'),
-                order_items=order_data.get('order_items', 'N/A'),
-                special_instructions=order_data.get('special_instructions', 'None')
-            )
-        )
+        # The summary prompt has no total field
+        fields.pop("order_total")
+        
+        # Shared client, subject to the pool's concurrency cap
+        summary = await llm_pool.ainvoke(ORDER_SUMMARY_PROMPT.format(**fields), temperature=0.3)
         
         return summary.content
     
-    async def send_twilio_notification(self, order_data, payment_data):
-        """Send WhatsApp notification to owner"""
-        try:
-            # Create notification message using LLM
-            llm = ChatGroq(
-                groq_api_key=os.getenv("GROQ_API_KEY"),
-                model_name="llama-3.1-70b-versatile",
-                temperature=0.3
-            )
-            
-            notification_msg = await llm.ainvoke(
-                TWILIO_NOTIFICATION_PROMPT.format(
-                    customer_name=order_data.get('customer_name', 'Customer'),
-                    phone_number=order_data.get('phone_number', 'N/A'),
-                    location=order_data.get('location', 'N/A'),
-                    order_items=order_data.get('order_items', 'N/A'),
-                    special_instructions=order_data.get('special_instructions', 'None'),
-                    order_total=order_data.get('order_total', '0'),
-                    payment_status=payment_data.get('status', 'confirmed')
-                )
-            )
-            
-            # Send WhatsApp message
-            message = self.twilio_client.messages.create(
-                body=notification_msg.content,
-                from_=os.getenv('TWILIO_WHATSAPP_FROM'),
-                to=os.getenv('OWNER_PHONE_NUMBER')
-            )
-            
-            return message.sid
-            
-        except Exception as e:
-            print(f"Twilio notification failed: {str(e)}")
-            return None
+    @traced("notification_render")
+    async def create_twilio_notification(self, order_data, payment_data):
+        """Create owner notification message from the fixed layout, or polished by the LLM"""
+        fields = self._layout_fields(order_data, payment_data)
+        if self.render_mode == "template":
+            return TWILIO_NOTIFICATION_TEMPLATE.format(**fields)
+        
+        notification_msg = await llm_pool.ainvoke(TWILIO_NOTIFICATION_PROMPT.format(**fields), temperature=0.3)
+        
+        return notification_msg.content
+    
+    @traced("notification_send")
+    async def send_whatsapp_message(self, body):
+        """Send WhatsApp message to owner, raising on failure"""
+        # The Twilio SDK is synchronous, so keep it off the event loop
+        message = await asyncio.to_thread(
+            self.twilio_client.messages.create,
+            body=body,
+            from_=os.getenv('TWILIO_WHATSAPP_FROM'),
+            to=os.getenv('OWNER_PHONE_NUMBER')
+        )
+        return message.sid
 
 # Global payment handler instance
 payment_handler = PaymentHandler()
\ No newline at end of file
@@ -0,0 +1,105 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+from src.tracing import bind, metrics, span
+
+# Paystack signs webhooks with the account's secret key
+SIGNATURE_HEADER = "x-paystack-signature"
+
+webhook_events = metrics.counter("dishdash_paystack_webhooks_total", "Paystack webhooks received, by outcome")
+
+
+def sign_payload(payload, secret_key):
+    """Body bytes and signature header value for a webhook, as Paystack would send it"""
+    body = json.dumps(payload, separators=(",", ":")).encode()
+    return body, hmac.new(secret_key.encode(), body, hashlib.sha512).hexdigest()
+
+
+def verify_signature(body, signature, secret_key):
+    if not signature or not secret_key:
+        return False
+    expected = hmac.new(secret_key.encode(), body, hashlib.sha512).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+def charge_success_event(reference, amount_kobo, **data):
+    """A charge.success payload; the local stand-in for what Paystack posts after a payment"""
+    return {
+        "event": "charge.success",
+        "data": {"status": "success", "reference": reference, "amount": amount_kobo, "currency": "NGN", **data},
+    }
+
+
+class PaystackWebhook:
+    """Completes orders from Paystack's charge.success webhooks, once per reference
+
+    The order is claimed and Paystack gets its 200 straight away; completion
+    (owner notification, summary, the message to the customer) runs in the
+    background through `on_paid`, so a burst of webhooks never waits on it.
+    """
+
+    def __init__(self, order_manager, on_paid=None, secret_key=None):
+        self.order_manager = order_manager
+        self.on_paid = on_paid or self._complete
+        self.secret_key = secret_key or os.getenv("PAYSTACK_SECRET_KEY")
+        self._background = set()
+
+    async def _complete(self, reference, verification, order_data):
+        await self.order_manager.complete_order(reference, verification, order_data)
+
+    async def handle(self, body, signature):
+        """(status code, response body) for one webhook delivery"""
+        if not verify_signature(body, signature, self.secret_key):
+            webhook_events.inc(outcome="bad_signature")
+            return 401, {"status": "invalid signature"}
+
+        try:
+            event = json.loads(body)
+            data = event.get("data") or {}
+        except (ValueError, AttributeError):
+            webhook_events.inc(outcome="malformed")
+            return 400, {"status": "malformed payload"}
+
+        if event.get("event") != "charge.success" or data.get("status") != "success":
+            webhook_events.inc(outcome="ignored")
+            return 200, {"status": "ignored"}
+
+        reference = data.get("reference")
+        order_data = self.order_manager.find_order_by_reference(reference) if reference else None
+        if order_data is None:
+            # Paystack retries non-2xx responses; an unknown reference won't resolve itself
+            webhook_events.inc(outcome="unknown_reference")
+            return 200, {"status": "unknown reference"}
+        bind(order_id=order_data["order_id"])
+
+        if data.get("amount") != round(order_data["total_amount"] * 100):
+            print(f"Paystack webhook for {reference}: amount {data.get('amount')} does not match the order total")
+            webhook_events.inc(outcome="amount_mismatch")
+            return 200, {"status": "amount mismatch"}
+
+        if not self.order_manager.claim_completion(reference):
+            webhook_events.inc(outcome="duplicate")
+            return 200, {"status": "already processed"}
+
+        verification = {"success": True, "data": data, "message": "Payment confirmed by webhook"}
+        task = asyncio.create_task(self._run(reference, verification, order_data))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        webhook_events.inc(outcome="accepted")
+        return 200, {"status": "accepted"}
+
+    async def _run(self, reference, verification, order_data):
+        try:
+            with span("webhook_completion"):
+                await self.on_paid(reference, verification, order_data)
+        except Exception as e:
+            # Leave the order pending so a retried webhook or the verify button can finish it
+            self.order_manager.release_completion(reference)
+            print(f"Completing order for {reference} from webhook failed: {e}")
+
+    async def drain(self):
+        """Wait for completions already accepted"""
+        while self._background:
+            await asyncio.gather(*list(self._background), return_exceptions=True)
@@ -1,10 +1,13 @@
-from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.prompts import PromptTemplate
 
 # Main RAG prompt for dish recommendations
-RAG_PROMPT = ChatPromptTemplate(
+RAG_PROMPT = PromptTemplate(
     template="""You are DishDash OrderBot, a helpful assistant for Nigerian food delivery.
 
 Use the following context about Nigerian dishes to answer the question. If you don't know the answer based on the context, say so.
+Use the conversation so far only to understand follow-up questions.
+
+Conversation so far: {history}
 
 Context: {context}
 
@@ -17,11 +20,13 @@ Please provide:
 4. Suggestions for complementary dishes
 
 Answer:""",
-    input_variables=["context", "question"]
+    input_variables=["context", "question"],
+    # Filled per session by src/conversation_memory.py; empty for a first question
+    partial_variables={"history": "None"}
 )
 
 # Order summary prompt
-ORDER_SUMMARY_PROMPT = ChatPromptTemplate(
+ORDER_SUMMARY_PROMPT = PromptTemplate(
     template="""Create a clear order summary for the following order:
 
 Customer: {customer_name}
@@ -43,7 +48,7 @@ Make it professional and easy to read.""",
 )
 
 # Twilio notification prompt
-TWILIO_NOTIFICATION_PROMPT = ChatPromptTemplate(
+TWILIO_NOTIFICATION_PROMPT = PromptTemplate(
     template="""🚨 NEW ORDER ALERT 🚨
 
 Customer: {customer_name}
@@ -60,4 +65,43 @@ Payment Status: {payment_status}
 
 Please prepare this order immediately!""",
     input_variables=["customer_name", "phone_number", "location", "order_items", "special_instructions", "order_total", "payment_status"]
-)
\ No newline at end of file
+)
+
+# Folds turns that fell out of the recent window into a session's rolling summary
+MEMORY_SUMMARY_PROMPT = PromptTemplate(
+    template="""Update the summary of a customer's chat with DishDash OrderBot, a Nigerian food delivery assistant.
+
+Current summary: {summary}
+
+Earlier turns to fold in:
+{turns}
+
+Write the updated summary in at most {max_words} words. Keep the dishes, preferences and constraints the customer mentioned; drop greetings and repeated details.
+
+Updated summary:""",
+    input_variables=["summary", "turns", "max_words"]
+)
+
+# Fixed layouts filled directly from order data when ORDER_RENDER_MODE=template
+ORDER_SUMMARY_TEMPLATE = """📦 ORDER SUMMARY
+👤 Customer: {customer_name}
+📞 Phone: {phone_number}
+📍 Location: {location}
+🍽️ Items: {order_items}
+📝 Instructions: {special_instructions}"""
+
+TWILIO_NOTIFICATION_TEMPLATE = """🚨 NEW ORDER ALERT 🚨
+
+Customer: {customer_name}
+Phone: {phone_number}
+Location: {location}
+
+Order Details:
+{order_items}
+
+Special Instructions: {special_instructions}
+
+Order Total: ₦{order_total}
+Payment Status: {payment_status}
+
+Please prepare this order immediately!"""
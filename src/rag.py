@@ -0,0 +1,147 @@
+import threading
+import time
+from collections import deque
+from src.llm_pool import SlotTimeout, llm_pool
+from src.context_packer import approx_tokens, parse_fields
+from src.tracing import metrics, span
+
+
+class AnswerMetrics:
+    """Per-request time to first token and total generation time for streamed answers"""
+
+    def __init__(self, max_samples=1000):
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=max_samples)
+
+    def record(self, source, ttft, total, tokens):
+        with self._lock:
+            self._samples.append({
+                "source": source,
+                "ttft_seconds": ttft,
+                "total_seconds": total,
+                "tokens": tokens,
+                "at": time.time(),
+            })
+
+    def recent(self, limit=20):
+        with self._lock:
+            return list(self._samples)[-limit:]
+
+    def stats(self):
+        with self._lock:
+            samples = list(self._samples)
+        result = {}
+        for source in sorted({sample["source"] for sample in samples}):
+            ttfts = sorted(sample["ttft_seconds"] for sample in samples if sample["source"] == source)
+            totals = sorted(sample["total_seconds"] for sample in samples if sample["source"] == source)
+            result[source] = {
+                "requests": len(ttfts),
+                "p50_ttft_seconds": round(ttfts[len(ttfts) // 2], 4),
+                "p95_ttft_seconds": round(ttfts[min(len(ttfts) - 1, int(len(ttfts) * 0.95))], 4),
+                "p50_total_seconds": round(totals[len(totals) // 2], 4),
+                "p95_total_seconds": round(totals[min(len(totals) - 1, int(len(totals) * 0.95))], 4),
+            }
+        return result
+
+
+async def astream_chain(qa_chain, question, callbacks=None, history=None, queue_timeout=None):
+    """Retrieve with the chain's retriever, then stream the LLM's tokens for the stuffed prompt
+
+    RetrievalQA.acall only returns once generation is done; running its two
+    halves ourselves lets the tokens reach the user as they are produced.
+    """
+    with span("retrieval"):
+        documents = await qa_chain.retriever.ainvoke(question)
+    combine_chain = qa_chain.combine_documents_chain
+    inputs = combine_chain._get_inputs(documents, question=question)
+    llm_chain = combine_chain.llm_chain
+    variables = {key: inputs[key] for key in llm_chain.prompt.input_variables}
+    if history:
+        # A partial variable of RAG_PROMPT, so RetrievalQA itself never has to supply it
+        variables["history"] = history
+    prompt = llm_chain.prompt.format_prompt(**variables)
+    prompt_tokens.observe(approx_tokens(prompt.to_string()))
+
+    with span("llm_generation"):
+        try:
+            async with llm_pool.slot(timeout=queue_timeout):
+                async for chunk in llm_chain.llm.astream(prompt, config={"callbacks": callbacks or []}):
+                    token = getattr(chunk, "content", chunk)
+                    if token:
+                        yield token
+        except SlotTimeout as e:
+            # Lets the caller answer from these without retrieving again
+            e.documents = documents
+            raise
+
+
+async def stream_answer(qa_chain, question, on_token, cached=None, callbacks=None, history=None, queue_timeout=None):
+    """Stream an answer through on_token and return the full text
+
+    A cached answer is sent in one piece. Timings go to answer_metrics.
+    Raises llm_pool.SlotTimeout, before any token is sent, if the LLM queue
+    doesn't clear within queue_timeout; its `documents` are the ones retrieved.
+    """
+    started = time.perf_counter()
+    if cached is not None:
+        await on_token(cached)
+        elapsed = time.perf_counter() - started
+        answer_metrics.record("cache", elapsed, elapsed, 1)
+        return cached
+
+    parts = []
+    first_token_at = None
+    async for token in astream_chain(qa_chain, question, callbacks, history, queue_timeout):
+        if first_token_at is None:
+            first_token_at = time.perf_counter()
+        parts.append(token)
+        await on_token(token)
+
+    finished = time.perf_counter()
+    time_to_first_token.observe((first_token_at or finished) - started)
+    answer_metrics.record(
+        "llm",
+        (first_token_at or finished) - started,
+        finished - started,
+        len(parts)
+    )
+    return "".join(parts)
+
+
+def format_retrieval_answer(documents):
+    """The top dishes' own descriptions, for when there's no capacity to generate an answer"""
+    lines = []
+    for doc in documents:
+        fields = parse_fields(doc.page_content)
+        name = fields.get("Food Name") or (doc.metadata or {}).get("food_name")
+        if not name:
+            continue
+        details = [fields[field] for field in ("Description", "Main Ingredients") if fields.get(field)]
+        lines.append(f"**{name}**" + (f": {details[0]}" if details else ""))
+    if not lines:
+        return "I couldn't find a matching dish on our menu. Could you rephrase that?"
+    return "Here's what I found on our menu:\n\n" + "\n\n".join(lines)
+
+
+async def retrieval_answer(qa_chain, question, on_token, documents=None):
+    """Answer from retrieval alone (no LLM) and send it in one piece"""
+    started = time.perf_counter()
+    if documents is None:
+        with span("retrieval"):
+            documents = await qa_chain.retriever.ainvoke(question)
+    answer = format_retrieval_answer(documents)
+    await on_token(answer)
+    elapsed = time.perf_counter() - started
+    answer_metrics.record("retrieval", elapsed, elapsed, 1)
+    return answer
+
+
+# Global answer metrics instance
+answer_metrics = AnswerMetrics()
+time_to_first_token = metrics.histogram(
+    "dishdash_llm_time_to_first_token_seconds", "Time from question to first streamed token"
+)
+prompt_tokens = metrics.histogram(
+    "dishdash_rag_prompt_tokens", "Approximate tokens in each RAG prompt sent to the LLM",
+    buckets=(250, 500, 750, 1000, 1250, 1500, 2000, 3000, 4000)
+)
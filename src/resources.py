@@ -0,0 +1,209 @@
+import os
+import sys
+import threading
+import time
+from src.llm_pool import llm_pool
+from src.prompt import RAG_PROMPT
+from src.local_index import LocalVectorStore, LOCAL_INDEX_DIR
+from src.intent_router import IntentRouter
+from src.menu_catalog import MenuCatalog
+from src.embedding_cache import CachedEmbeddings
+from src.context_packer import ContextPacker, PackedRetriever
+from src.lexical_index import HybridRetriever, LexicalIndex
+from src.tracing import metrics
+
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+INDEX_NAME = "dashdishorderbot"
+WARMUP_QUERY = "jollof rice"
+
+# "pinecone" (default) or "local" for the in-process index built by store_index.py
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone")
+
+# Set EMBEDDING_CACHE=off to always run the model
+EMBEDDING_CACHE = os.getenv("EMBEDDING_CACHE", "on")
+
+
+def _current_rss_bytes():
+    """Resident set size of this process (Linux /proc, falls back to peak RSS)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is bytes on macOS and kilobytes elsewhere
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _model_bytes(embeddings):
+    """Size of the sentence-transformers weights behind the embeddings"""
+    model = getattr(embeddings, "_client", None)
+    if model is None or not hasattr(model, "parameters"):
+        return None
+    return sum(p.numel() * p.element_size() for p in model.parameters())
+
+
+class SessionResources:
+    """Cheap per-session handle onto the shared resources"""
+
+    def __init__(self, registry, session_id):
+        self.registry = registry
+        self.session_id = session_id
+
+    @property
+    def embeddings(self):
+        return self.registry.get_embeddings()
+
+    @property
+    def vectorstore(self):
+        return self.registry.get_vectorstore()
+
+    @property
+    def qa_chain(self):
+        return self.registry.get_qa_chain()
+
+    def release(self):
+        self.registry.release(self.session_id)
+
+
+class ResourceRegistry:
+    """Loads heavy resources once per process and shares them across sessions"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._resources = {}
+        self._load_seconds = {}
+        self._rss_delta = {}
+        self._sessions = set()
+        self.warmup_seconds = None
+
+    def _get_or_create(self, name, factory):
+        resource = self._resources.get(name)
+        if resource is not None:
+            return resource
+
+        with self._lock:
+            resource = self._resources.get(name)
+            if resource is None:
+                rss_before = _current_rss_bytes()
+                started = time.perf_counter()
+                resource = factory()
+                self._load_seconds[name] = time.perf_counter() - started
+                self._rss_delta[name] = max(_current_rss_bytes() - rss_before, 0)
+                self._resources[name] = resource
+        return resource
+
+    def provide(self, name, resource):
+        """Install a ready-made resource (e.g. a local stand-in) instead of building it"""
+        with self._lock:
+            self._resources[name] = resource
+            self._load_seconds[name] = 0.0
+            self._rss_delta[name] = 0
+
+    def get_embeddings(self):
+        def load():
+            from langchain_huggingface import HuggingFaceEmbeddings
+            embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
+            return CachedEmbeddings(embeddings) if EMBEDDING_CACHE != "off" else embeddings
+        return self._get_or_create("embeddings", load)
+
+    def get_vectorstore(self, backend=None):
+        backend = backend or VECTOR_BACKEND
+        if backend == "local":
+            factory = lambda: LocalVectorStore.load(self.get_embeddings(), LOCAL_INDEX_DIR)
+        elif backend == "pinecone":
+            def factory():
+                from langchain_pinecone import PineconeVectorStore
+                return PineconeVectorStore.from_existing_index(
+                    index_name=INDEX_NAME,
+                    embedding=self.get_embeddings()
+                )
+        else:
+            raise ValueError(f"Unknown VECTOR_BACKEND: {backend}")
+
+        name = "vectorstore" if backend == VECTOR_BACKEND else f"vectorstore:{backend}"
+        return self._get_or_create(name, factory)
+
+    def get_llm(self):
+        return self._get_or_create(
+            "llm",
+            lambda: llm_pool.get_llm(temperature=0.4, streaming=True)
+        )
+
+    def get_lexical_index(self):
+        return self._get_or_create("lexical_index", LexicalIndex.load)
+
+    def get_retriever(self, packed=True, hybrid=True):
+        """Top-k dishes (exact name, or BM25 fused with dense), packed into the context token budget"""
+        retriever = self.get_vectorstore().as_retriever(search_kwargs={"k": 3})
+        if hybrid and len(self.get_lexical_index()):
+            retriever = HybridRetriever(dense=retriever, lexical=self.get_lexical_index(), k=3)
+        return PackedRetriever(retriever=retriever, packer=ContextPacker()) if packed else retriever
+
+    def get_qa_chain(self):
+        # The chain holds no per-conversation state, so one instance serves everyone
+        def load():
+            from langchain.chains import RetrievalQA
+            return RetrievalQA.from_chain_type(
+                llm=self.get_llm(),
+                chain_type="stuff",
+                retriever=self.get_retriever(),
+                chain_type_kwargs={"prompt": RAG_PROMPT},
+                return_source_documents=True
+            )
+        return self._get_or_create("qa_chain", load)
+
+    def get_intent_router(self):
+        return self._get_or_create("intent_router", lambda: IntentRouter(self.get_embeddings()))
+
+    def get_menu_catalog(self):
+        return self._get_or_create("menu_catalog", MenuCatalog.load)
+
+    def warm_up(self):
+        """Load everything and run a dummy query so the first customer doesn't pay for it"""
+        started = time.perf_counter()
+        self.get_qa_chain()
+        self.get_embeddings().embed_query(WARMUP_QUERY)
+        self.get_vectorstore().similarity_search(WARMUP_QUERY, k=1)
+        self.get_intent_router().classify_vector(self.get_embeddings().embed_query(WARMUP_QUERY))
+        self.get_menu_catalog()
+        self.get_lexical_index()
+        self.warmup_seconds = time.perf_counter() - started
+        return self.warmup_seconds
+
+    def acquire(self, session_id):
+        """Register a session and hand it a handle onto the shared resources"""
+        with self._lock:
+            self._sessions.add(session_id)
+        return SessionResources(self, session_id)
+
+    def release(self, session_id):
+        with self._lock:
+            self._sessions.discard(session_id)
+
+    def stats(self):
+        """Sessions served, load time and memory use of each loaded resource"""
+        with self._lock:
+            sessions = len(self._sessions)
+            resources = {}
+            for name, resource in self._resources.items():
+                memory = _model_bytes(resource) if name == "embeddings" else None
+                resources[name] = {
+                    "sessions": sessions,
+                    "load_seconds": round(self._load_seconds[name], 4),
+                    "rss_delta_bytes": self._rss_delta[name],
+                    "memory_bytes": memory if memory is not None else self._rss_delta[name],
+                }
+        embeddings = self._resources.get("embeddings")
+        return {
+            "active_sessions": sessions,
+            "warmup_seconds": self.warmup_seconds,
+            "process_rss_bytes": _current_rss_bytes(),
+            "resources": resources,
+            "embedding_cache": embeddings.stats() if isinstance(embeddings, CachedEmbeddings) else None,
+        }
+
+
+# Global resource registry instance
+resource_registry = ResourceRegistry()
+metrics.gauge("dishdash_active_sessions", "Chat sessions currently connected", lambda: len(resource_registry._sessions))
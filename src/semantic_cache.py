@@ -0,0 +1,174 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+import numpy as np
+
+# store_index.py rewrites this file after every ingest; a change drops cached answers
+INDEX_VERSION_FILE = os.getenv("INDEX_VERSION_FILE", "artifacts/index_version")
+
+
+def mark_index_updated(path=INDEX_VERSION_FILE):
+    """Record that the menu was re-ingested so cached answers are discarded"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        f.write(f"{time.time()} {uuid.uuid4().hex}\n")
+
+
+def _index_version(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _normalize_text(text):
+    return " ".join(text.lower().split())
+
+
+class SemanticCache:
+    """Answer cache keyed on query embeddings with LRU and TTL eviction"""
+
+    def __init__(self, threshold=0.92, max_entries=1000, ttl_seconds=3600,
+                 version_file=INDEX_VERSION_FILE):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.version_file = version_file
+
+        self._lock = threading.Lock()
+        self._vectors = None             # (max_entries, dim) matrix, one row per slot
+        self._entries = OrderedDict()    # slot -> (text, answer, created_at), LRU order
+        self._by_text = {}               # normalized text -> slot
+        self._free_slots = list(range(max_entries - 1, -1, -1))
+        self._version = _index_version(version_file)
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _check_version(self):
+        version = _index_version(self.version_file)
+        if version != self._version:
+            self._version = version
+            self._clear()
+            self.invalidations += 1
+
+    def _clear(self):
+        self._entries.clear()
+        self._by_text.clear()
+        self._free_slots = list(range(self.max_entries - 1, -1, -1))
+
+    def _evict(self, slot):
+        text, _, _ = self._entries.pop(slot)
+        self._by_text.pop(text, None)
+        self._free_slots.append(slot)
+
+    def _expire(self, now):
+        # Entries are in LRU order, not insertion order, so scan them all
+        expired = [
+            slot for slot, (_, _, created_at) in self._entries.items()
+            if now - created_at > self.ttl_seconds
+        ]
+        for slot in expired:
+            self._evict(slot)
+            self.evictions += 1
+
+    def _normalized_vector(self, vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup_text(self, text):
+        """Exact-match lookup on the normalized question, without embedding it"""
+        with self._lock:
+            self._check_version()
+            slot = self._by_text.get(_normalize_text(text))
+            if slot is None:
+                self.misses += 1
+                return None
+            _, answer, created_at = self._entries[slot]
+            if time.time() - created_at > self.ttl_seconds:
+                self._evict(slot)
+                self.evictions += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(slot)
+            self.hits += 1
+            return answer
+
+    def lookup(self, vector, after_text_miss=False):
+        """Return the cached answer of the most similar question above the threshold
+
+        With after_text_miss, the question already counted a miss in lookup_text;
+        a hit here replaces it, so each question counts once.
+        """
+        with self._lock:
+            self._check_version()
+            self._expire(time.time())
+            if not self._entries:
+                if not after_text_miss:
+                    self.misses += 1
+                return None
+
+            slots = np.fromiter(self._entries.keys(), dtype=np.int64)
+            scores = self._vectors[slots] @ self._normalized_vector(vector)
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                if not after_text_miss:
+                    self.misses += 1
+                return None
+
+            slot = int(slots[best])
+            self._entries.move_to_end(slot)
+            if after_text_miss:
+                self.misses -= 1
+            self.hits += 1
+            return self._entries[slot][1]
+
+    def store(self, text, vector, answer):
+        vector = self._normalized_vector(vector)
+        key = _normalize_text(text)
+        with self._lock:
+            self._check_version()
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+
+            if key in self._by_text:
+                self._evict(self._by_text[key])
+            if not self._free_slots:
+                oldest = next(iter(self._entries))
+                self._evict(oldest)
+                self.evictions += 1
+
+            slot = self._free_slots.pop()
+            self._vectors[slot] = vector
+            self._entries[slot] = (key, answer, time.time())
+            self._by_text[key] = slot
+
+    def invalidate(self):
+        with self._lock:
+            self._clear()
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+# Global semantic cache instance
+semantic_cache = SemanticCache(
+    threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92")),
+    max_entries=int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1000")),
+    ttl_seconds=float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "3600"))
+)
@@ -0,0 +1,166 @@
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+from src.session_store import encode, session_backend, snapshot
+from src.tracing import metrics
+
+SESSION_COMPACT_AFTER_SECONDS = float(os.getenv("SESSION_COMPACT_AFTER_SECONDS", "600"))
+SESSION_EVICT_AFTER_SECONDS = float(os.getenv("SESSION_EVICT_AFTER_SECONDS", "3600"))
+SESSION_MAX_LIVE = int(os.getenv("SESSION_MAX_LIVE", "2000"))
+SESSION_SWEEP_SECONDS = float(os.getenv("SESSION_SWEEP_SECONDS", "30"))
+
+# Dropped from an idle session once its order flow is saved; restored on its next message
+COMPACTED_KEYS = ("order_cart", "customer_info", "order_stage", "payment_reference", "current_order", "memory")
+
+session_events = metrics.counter("dishdash_session_events_total", "Sessions compacted or evicted, and why")
+
+
+class SessionEntry:
+    __slots__ = ("session_key", "state", "close", "last_active", "compacted")
+
+    def __init__(self, session_key, state, close):
+        self.session_key = session_key
+        self.state = state          # the session's own dict (Chainlit's user_sessions[id])
+        self.close = close          # async () -> None, disconnects the client
+        self.last_active = time.monotonic()
+        self.compacted = False
+
+
+def state_bytes(state):
+    """Approximate bytes a session holds beyond the shared resources"""
+    size = len(encode(snapshot(state)))
+    if state.get("current_order"):
+        size += len(json.dumps(state["current_order"], default=str))
+    memory = state.get("memory")
+    if memory is not None:
+        size += memory.size_bytes()
+    return size
+
+
+class SessionManager:
+    """Tracks live sessions by last activity; compacts idle ones, evicts long-idle ones, caps the total
+
+    Compacting saves the order flow to the session backend and drops it from
+    memory; the app restores it when the customer writes again. Evicting also
+    disconnects the client, whose next visit resumes from the same snapshot.
+    """
+
+    def __init__(self, backend, compact_after=SESSION_COMPACT_AFTER_SECONDS, evict_after=SESSION_EVICT_AFTER_SECONDS,
+                 max_sessions=SESSION_MAX_LIVE, sweep_interval=SESSION_SWEEP_SECONDS):
+        self.backend = backend
+        self.compact_after = compact_after
+        self.evict_after = evict_after
+        self.max_sessions = max_sessions
+        self.sweep_interval = sweep_interval
+        self._sessions = OrderedDict()   # session id -> SessionEntry, least recently active first
+        self._sweeper = None
+        self.compactions = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def start(self):
+        """Idempotent; starts the idle sweep on the running loop"""
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    async def stop(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            await asyncio.gather(self._sweeper, return_exceptions=True)
+            self._sweeper = None
+
+    async def register(self, session_id, session_key, state, close=None):
+        self.start()
+        self._sessions[session_id] = SessionEntry(session_key, state, close)
+        self._sessions.move_to_end(session_id)
+        # Over the cap, the least recently active sessions make room
+        while len(self._sessions) > self.max_sessions:
+            oldest = next(iter(self._sessions))
+            await self.evict(oldest, reason="cap")
+
+    def touch(self, session_id):
+        """Record activity; True if the session was compacted and needs restoring"""
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return False
+        entry.last_active = time.monotonic()
+        self._sessions.move_to_end(session_id)
+        compacted, entry.compacted = entry.compacted, False
+        return compacted
+
+    def unregister(self, session_id):
+        self._sessions.pop(session_id, None)
+
+    async def compact(self, session_id):
+        entry = self._sessions.get(session_id)
+        if entry is None or entry.compacted:
+            return
+        state = entry.state
+        await asyncio.to_thread(self.backend.save, entry.session_key, snapshot(state))
+        memory = state.get("memory")
+        if memory is not None:
+            await memory.aclose()
+        for key in COMPACTED_KEYS:
+            state.pop(key, None)
+        entry.compacted = True
+        self.compactions += 1
+        session_events.inc(event="compacted")
+
+    async def evict(self, session_id, reason="idle"):
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return
+        await self.compact(session_id)
+        self._sessions.pop(session_id, None)
+        self.evictions += 1
+        session_events.inc(event="evicted", reason=reason)
+        if entry.close is not None:
+            try:
+                await entry.close()
+            except Exception as e:
+                print(f"Closing evicted session {session_id} failed: {e}")
+
+    async def sweep(self):
+        now = time.monotonic()
+        for session_id, entry in list(self._sessions.items()):
+            idle = now - entry.last_active
+            if idle < self.compact_after:
+                # Ordered by activity, so everyone after this is more recent
+                break
+            if idle >= self.evict_after:
+                await self.evict(session_id)
+            elif not entry.compacted:
+                await self.compact(session_id)
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                print(f"Session sweep failed: {e}")
+
+    def stats(self):
+        entries = list(self._sessions.values())
+        now = time.monotonic()
+        return {
+            "live": len(entries),
+            "compacted": sum(entry.compacted for entry in entries),
+            "state_bytes": sum(state_bytes(entry.state) for entry in entries),
+            "oldest_idle_seconds": round(now - entries[0].last_active, 1) if entries else None,
+            "compactions": self.compactions,
+            "evictions": self.evictions,
+        }
+
+
+# Global session manager instance
+session_manager = SessionManager(session_backend)
+metrics.gauge("dishdash_sessions_live", "Sessions tracked by the session manager", lambda: len(session_manager))
+metrics.gauge(
+    "dishdash_sessions_compacted", "Live sessions whose order flow has been moved to the session backend",
+    lambda: sum(entry.compacted for entry in list(session_manager._sessions.values()))
+)
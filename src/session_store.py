@@ -0,0 +1,147 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "artifacts/sessions.db")
+
+# The order-flow state that has to survive a restart or a move to another worker
+FLOW_KEYS = ("order_cart", "customer_info", "order_stage", "payment_reference")
+SNAPSHOT_VERSION = 1
+
+
+def snapshot(user_session):
+    """Compact, JSON-serializable snapshot of a session's order flow
+
+    The current order is stored by ID only; the order store holds the rest.
+    """
+    state = {"v": SNAPSHOT_VERSION}
+    for key in FLOW_KEYS:
+        value = user_session.get(key)
+        if value:
+            state[key] = value
+    current_order = user_session.get("current_order")
+    if current_order:
+        state["order_id"] = current_order["order_id"]
+    return state
+
+
+def restore(user_session, state, get_order):
+    """Apply a snapshot to a session; returns False if there was nothing to restore"""
+    if not state or state.get("v") != SNAPSHOT_VERSION:
+        return False
+    user_session.set("order_cart", state.get("order_cart", []))
+    user_session.set("customer_info", state.get("customer_info", {}))
+    user_session.set("order_stage", state.get("order_stage", "welcome"))
+    if state.get("payment_reference"):
+        user_session.set("payment_reference", state["payment_reference"])
+    if state.get("order_id"):
+        order = get_order(state["order_id"])
+        if order is not None:
+            user_session.set("current_order", order)
+    return True
+
+
+def encode(state):
+    return json.dumps(state, separators=(",", ":"))
+
+
+def decode(payload):
+    return json.loads(payload) if payload else None
+
+
+class SessionStateBackend:
+    """Interface for storing order-flow snapshots outside the worker process"""
+
+    def load(self, session_key):
+        raise NotImplementedError
+
+    def save(self, session_key, state):
+        raise NotImplementedError
+
+    def delete(self, session_key):
+        raise NotImplementedError
+
+
+class InMemorySessionStateBackend(SessionStateBackend):
+    """Single-process backend; state is lost on restart"""
+
+    def __init__(self):
+        self._states = {}
+
+    def load(self, session_key):
+        return decode(self._states.get(session_key))
+
+    def save(self, session_key, state):
+        self._states[session_key] = encode(state)
+
+    def delete(self, session_key):
+        self._states.pop(session_key, None)
+
+
+class SQLiteSessionStateBackend(SessionStateBackend):
+    """Shared SQLite (WAL) file that every app process on the host can read and write"""
+
+    def __init__(self, path=SESSION_DB_PATH, ttl_seconds=24 * 3600):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS session_state (
+                    session_key TEXT PRIMARY KEY,
+                    state TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS session_state_updated_at ON session_state (updated_at)")
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def load(self, session_key):
+        row = self._connection().execute(
+            "SELECT state, updated_at FROM session_state WHERE session_key = ?", (session_key,)
+        ).fetchone()
+        if row is None or time.time() - row[1] > self.ttl_seconds:
+            return None
+        return decode(row[0])
+
+    def save(self, session_key, state):
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO session_state (session_key, state, updated_at) VALUES (?, ?, ?)",
+                (session_key, encode(state), time.time())
+            )
+
+    def delete(self, session_key):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM session_state WHERE session_key = ?", (session_key,))
+
+    def purge_expired(self):
+        with self._connection() as conn:
+            return conn.execute(
+                "DELETE FROM session_state WHERE updated_at < ?", (time.time() - self.ttl_seconds,)
+            ).rowcount
+
+
+def create_session_backend(kind=None):
+    """Build the backend selected by SESSION_BACKEND ("sqlite" by default, or "memory")"""
+    kind = kind or os.getenv("SESSION_BACKEND", "sqlite")
+    if kind == "memory":
+        return InMemorySessionStateBackend()
+    if kind == "sqlite":
+        return SQLiteSessionStateBackend()
+    raise ValueError(f"Unknown SESSION_BACKEND: {kind}")
+
+
+# Global session state backend instance
+session_backend = create_session_backend()
@@ -0,0 +1,197 @@
+import bisect
+import contextvars
+import functools
+import os
+import threading
+import time
+from collections import deque
+
+# Spans slower than this are printed with their session/order IDs
+TRACE_SLOW_SECONDS = float(os.getenv("TRACE_SLOW_SECONDS", "5"))
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+session_id_var = contextvars.ContextVar("session_id", default=None)
+order_id_var = contextvars.ContextVar("order_id", default=None)
+
+
+def bind(session_id=None, order_id=None):
+    """Tag every span in the current context (and tasks started from it) with these IDs"""
+    if session_id is not None:
+        session_id_var.set(session_id)
+    if order_id is not None:
+        order_id_var.set(order_id)
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"') for value in labels.values())
+    return "{" + ",".join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in self._values.items():
+                lines.append(f"{self.name}{_label_text(dict(key))} {value}")
+        return lines
+
+
+class Gauge:
+    """Set directly, or read from a callback at scrape time"""
+
+    def __init__(self, name, help_text, function=None):
+        self.name = name
+        self.help_text = help_text
+        self.function = function
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set(self, value):
+        with self._lock:
+            self._value = value
+
+    def render(self):
+        try:
+            value = self.function() if self.function else self._value
+        except Exception:
+            value = float("nan")
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge", f"{self.name} {value}"]
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+        for key, (counts, total, count) in series.items():
+            labels = dict(key)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_label_text({**labels, 'le': bound})} {cumulative}")
+            lines.append(f"{self.name}_bucket{_label_text({**labels, 'le': '+Inf'})} {count}")
+            lines.append(f"{self.name}_sum{_label_text(labels)} {round(total, 6)}")
+            lines.append(f"{self.name}_count{_label_text(labels)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+
+    def _add(self, metric):
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help_text):
+        return self._add(Counter(name, help_text))
+
+    def gauge(self, name, help_text, function=None):
+        return self._add(Gauge(name, help_text, function))
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help_text, buckets))
+
+    def render(self):
+        """Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Global metrics registry instance
+metrics = MetricsRegistry()
+
+span_seconds = metrics.histogram("dishdash_span_duration_seconds", "Time spent in each traced step of the request path")
+span_errors = metrics.counter("dishdash_span_errors_total", "Traced steps that raised or reported failure")
+recent_spans = deque(maxlen=500)
+
+
+class span:
+    """Time a step of the request path; works with `with` and `async with`
+
+    Cost is two clock reads and one locked histogram update, so spans stay on
+    in production.
+    """
+
+    __slots__ = ("name", "started")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.started
+        span_seconds.observe(elapsed, span=self.name)
+        # A stream closed early by its consumer isn't a failure
+        error = exc_type.__name__ if exc_type is not None and not issubclass(exc_type, GeneratorExit) else None
+        if error:
+            span_errors.inc(span=self.name, error=error)
+        record = (self.name, elapsed, session_id_var.get(), order_id_var.get(), error)
+        recent_spans.append(record)
+        if elapsed > TRACE_SLOW_SECONDS:
+            print(f"Slow span {self.name}: {elapsed:.2f}s session={record[2]} order={record[3]}")
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+
+def traced(name):
+    """Decorator form of span() for async functions"""
+    def decorate(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with span(name):
+                result = await func(*args, **kwargs)
+            # Calls that report failure instead of raising, like {"success": False, ...}
+            if isinstance(result, dict) and result.get("success") is False:
+                span_errors.inc(span=name, error="unsuccessful")
+            return result
+        return wrapper
+    return decorate
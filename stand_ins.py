@@ -0,0 +1,200 @@
+import asyncio
+import hashlib
+import json
+import random
+import socket
+import threading
+import time
+import uuid
+import numpy as np
+import uvicorn
+from urllib.parse import parse_qs
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from langchain_core.embeddings import Embeddings
+from src.local_index import LocalVectorStore
+
+# Local stand-ins for external services, used by benchmark.py. Each one mimics
+# just enough of the real API for the bot's code paths, with configurable latency.
+
+
+def create_paystack_app(latency=0.2, failure_rate=0.0):
+    """Paystack transaction/initialize and transaction/verify"""
+    app = FastAPI()
+    app.state.calls = {"initialize": 0, "verify": 0}
+
+    async def respond(payload):
+        await asyncio.sleep(latency)
+        if random.random() < failure_rate:
+            return JSONResponse({"status": False, "message": "Upstream error"}, status_code=503)
+        return JSONResponse(payload)
+
+    @app.post("/transaction/initialize")
+    async def initialize(request: Request):
+        app.state.calls["initialize"] += 1
+        body = await request.json()
+        reference = body.get("reference") or uuid.uuid4().hex[:12]
+        return await respond({
+            "status": True,
+            "message": "Authorization URL created",
+            "data": {
+                "authorization_url": f"https://checkout.paystack.com/{reference}",
+                "access_code": uuid.uuid4().hex[:10],
+                "reference": reference,
+            },
+        })
+
+    @app.get("/transaction/verify/{reference}")
+    async def verify(reference: str):
+        app.state.calls["verify"] += 1
+        return await respond({
+            "status": True,
+            "message": "Verification successful",
+            "data": {"status": "success", "reference": reference, "amount": 150000},
+        })
+
+    return app
+
+
+FAKE_ANSWER = (
+    "Egusi Soup is a rich, thick soup made from ground melon seeds, leafy greens and palm oil. "
+    "It takes about an hour to prepare and goes well with Pounded Yam or Eba. "
+    "If you like it spicy, try Efo Riro or a bowl of Pepper Soup on the side."
+)
+
+
+def create_llm_app(ttft=0.3, token_delay=0.01, answer=FAKE_ANSWER):
+    """Groq's OpenAI-compatible chat completions, streamed or not"""
+    app = FastAPI()
+    app.state.calls = 0
+
+    def chunk(completion_id, model, delta, finish_reason=None):
+        return "data: " + json.dumps({
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }) + "\n\n"
+
+    @app.post("/openai/v1/chat/completions")
+    async def completions(request: Request):
+        app.state.calls += 1
+        body = await request.json()
+        model = body.get("model", "stand-in")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        tokens = answer.split(" ")
+
+        if body.get("stream"):
+            async def stream():
+                await asyncio.sleep(ttft)
+                yield chunk(completion_id, model, {"role": "assistant", "content": ""})
+                for i, token in enumerate(tokens):
+                    yield chunk(completion_id, model, {"content": token if i == 0 else " " + token})
+                    await asyncio.sleep(token_delay)
+                yield chunk(completion_id, model, {}, "stop")
+                yield "data: [DONE]\n\n"
+            return StreamingResponse(stream(), media_type="text/event-stream")
+
+        await asyncio.sleep(ttft + token_delay * len(tokens))
+        return JSONResponse({
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 100, "completion_tokens": len(tokens), "total_tokens": 100 + len(tokens)},
+        })
+
+    return app
+
+
+def create_twilio_app(latency=0.1):
+    """Twilio's Messages resource"""
+    app = FastAPI()
+    app.state.messages = []
+
+    @app.post("/2010-04-01/Accounts/{account_sid}/Messages.json")
+    async def create_message(account_sid: str, request: Request):
+        form = {key: values[0] for key, values in parse_qs((await request.body()).decode()).items()}
+        await asyncio.sleep(latency)
+        app.state.messages.append(form.get("Body", ""))
+        return JSONResponse({
+            "sid": f"SM{uuid.uuid4().hex}",
+            "account_sid": account_sid,
+            "body": form.get("Body", ""),
+            "from": form.get("From"),
+            "to": form.get("To"),
+            "status": "queued",
+        }, status_code=201)
+
+    return app
+
+
+def twilio_http_client(base_url):
+    """A Twilio HTTP client that sends every request to base_url instead of api.twilio.com"""
+    from twilio.http.http_client import TwilioHttpClient
+
+    class StandInHttpClient(TwilioHttpClient):
+        def request(self, method, url, *args, **kwargs):
+            return super().request(method, url.replace("https://api.twilio.com", base_url), *args, **kwargs)
+
+    return StandInHttpClient()
+
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic hash-seeded unit vectors with a fixed per-call delay"""
+
+    def __init__(self, dim=384, latency=0.01):
+        self.dim = dim
+        self.latency = latency
+        self.model_name = "stand-in"
+
+    def _vector(self, text):
+        seed = int.from_bytes(hashlib.sha1(text.encode("utf-8")).digest()[:4], "little")
+        vector = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts):
+        time.sleep(self.latency)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        time.sleep(self.latency)
+        return self._vector(text)
+
+
+class DelayedVectorStore(LocalVectorStore):
+    """The local index with a fixed delay per search, standing in for a remote vector database"""
+
+    latency = 0.05
+
+    def similarity_search_by_vector_with_score(self, embedding, k=4):
+        time.sleep(self.latency)
+        return super().similarity_search_by_vector_with_score(embedding, k)
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class BackgroundServer:
+    """Run an ASGI app with uvicorn on a background thread"""
+
+    def __init__(self, app, port=None):
+        self.port = port or _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join(timeout=5)
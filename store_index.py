@@ -1,11 +1,15 @@
-from langchain_pinecone import PineconeVectorStore
 from dotenv import load_dotenv
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_huggingface import HuggingFaceEmbeddings
 from pinecone.grpc import PineconeGRPC as Pinecone
 from datasets import load_dataset
 from pinecone import ServerlessSpec
-import pandas as pd
+from src.local_index import LOCAL_INDEX_DIR
+from src.ingestion import IngestManifest, IngestPipeline, LocalIndexSink, PineconeSink, content_hash, dish_text
+from src.lexical_index import LexicalIndexWriter
+from src.semantic_cache import mark_index_updated
+from src.menu_catalog import MenuCatalog, MenuCatalogWriter
+from src.embedding_cache import CachedEmbeddings
 import os
 
 
@@ -13,48 +17,97 @@ load_dotenv()
 
 # Read API key from environment variable
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
-if PINECONE_API_KEY is None:
-    raise ValueError("PINECONE_API_KEY environment variable is not set.")
 
-def setup_pinecone_index():
-    """Run this function once to set up your Pinecone index"""
-    
-    # Load dataset
+# "pinecone" (default) or "local"
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone")
+
+# Memory use is bounded by these, not by the size of the dataset
+INGEST_ROW_BATCH_SIZE = int(os.getenv("INGEST_ROW_BATCH_SIZE", "256"))
+INGEST_EMBED_BATCH_SIZE = int(os.getenv("INGEST_EMBED_BATCH_SIZE", "64"))
+INGEST_EMBED_WORKERS = int(os.getenv("INGEST_EMBED_WORKERS", "4"))
+
+# Per-dish fields kept for the lexical index (not the long text columns)
+DISH_FIELDS = ("Food_Name", "Price_Range", "Main_Ingredients", "Food_Class", "Region")
+
+def iter_dish_rows(catalog=None, lexical=None):
+    """Stream Nigerian-Dishes rows without loading the whole dataset"""
+    dataset_dishes = load_dataset("Nnobody/Nigerian-Dishes", split="train", streaming=True)
+    for row in dataset_dishes:
+        if catalog is not None:
+            # Straight to disk too; only the few fields the cart prices from
+            catalog.add(MenuCatalog.item_from_row(row))
+        if lexical is not None:
+            # Straight to disk; the lexical retriever's rows carry each dish's full text
+            text = dish_text(row)
+            lexical.add({**{key: row.get(key) for key in DISH_FIELDS}, "text": text, "row_hash": content_hash(text)})
+        yield row
+
+def build_pipeline(sink, manifest, embeddings):
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=1000,
+        chunk_overlap=200,
+        length_function=len,
+    )
+    return IngestPipeline(
+        embeddings=embeddings,
+        sink=sink,
+        manifest=manifest,
+        splitter=text_splitter,
+        row_batch_size=INGEST_ROW_BATCH_SIZE,
+        embed_batch_size=INGEST_EMBED_BATCH_SIZE,
+        embed_workers=INGEST_EMBED_WORKERS
+    )
+
+def run_ingest(sink, manifest, embeddings):
+    """Sync the target with the dataset, then refresh the menu catalog and cached answers"""
+    catalog = MenuCatalogWriter()
+    # Built alongside the vectors so exact dish names can skip dense search
+    lexical = LexicalIndexWriter()
+    pipeline = build_pipeline(sink, manifest, embeddings)
     try:
-        dataset_dishes = load_dataset("Nnobody/Nigerian-Dishes")
-        df_dishes = pd.DataFrame(dataset_dishes["train"])
-        print("\nSuccessfully loaded Nnobody/Nigerian-Dishes")
+        stats = pipeline.run(iter_dish_rows(catalog, lexical))
     except Exception as e:
-        print(f"Error loading Nnobody/Nigerian-Dishes: {e}")
-        return
-
-    # Combine all relevant text columns into one string per row for chunking
-    texts_to_chunk = [
-        f"Food Name: {row['Food_Name']}. Main Ingredients: {row['Main_Ingredients']}. Description: {row['Description']}. Health Benefits: {row['Food_Health']}. Class: {row['Food_Class']}. Region: {row['Region']}" 
-        for index, row in df_dishes.iterrows()
-    ]
-
-    # Function to chunk the texts
-    def chunk_texts_for_rag(texts):
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len,
-        )
-        text_chunks = text_splitter.create_documents(texts)
-        return text_chunks
+        catalog.discard()
+        lexical.discard()
+        print(f"Error ingesting Nnobody/Nigerian-Dishes: {e}")
+        return None
+    finally:
+        manifest.close()
+
+    catalog.commit()
+    print(f"Saved menu catalog with {catalog.count} dishes")
+
+    lexical.commit()
+    print(f"Saved lexical index with {lexical.count} dishes")
 
-    # Execute the function
-    dish_chunks = chunk_texts_for_rag(texts_to_chunk)
+    print(
+        f"Rows: {stats['rows']} ({stats['changed_rows']} new or changed, {stats['deleted_rows']} removed), "
+        f"embeddings: {stats['embeddings']}, {stats['seconds']}s, "
+        f"{stats['rows_per_second']} rows/s, {stats['embeddings_per_second']} embeddings/s"
+    )
+
+    cache = embeddings.stats() if isinstance(embeddings, CachedEmbeddings) else None
+    if cache:
+        print(f"Embedding cache: {cache['hits']} hits, {cache['misses']} misses, hit rate {cache['hit_rate']}, ~{cache['seconds_saved']}s saved")
+
+    # Answers cached against the old menu are now stale
+    if pipeline.changed:
+        mark_index_updated()
+    return stats
+
+def setup_pinecone_index():
+    """Run this function to create the Pinecone index or bring it up to date with the dataset"""
+    if PINECONE_API_KEY is None:
+        raise ValueError("PINECONE_API_KEY environment variable is not set.")
 
     # Initialize embeddings
-    embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+    embeddings = CachedEmbeddings(HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2"))
 
     # Initialize client
     pc = Pinecone(api_key=PINECONE_API_KEY)
 
     index_name = "dashdishorderbot"
-    vector_dimension = 384 
+    vector_dimension = 384
     metric_type = "cosine"
 
     # Check whether the index exists
@@ -69,17 +122,36 @@ def setup_pinecone_index():
     else:
         print(f"Index {index_name} already exists")
 
-    # Populate the index
-    print("Populating Pinecone index with dish data...")
-    docsearch = PineconeVectorStore.from_documents(
-        documents=dish_chunks,
-        index_name=index_name,
-        embedding=embeddings
-    )
-    print("✅ Pinecone index populated successfully!")
-    
-    return docsearch
+    sink = PineconeSink(pc.Index(index_name))
+    manifest = IngestManifest(target=f"pinecone:{index_name}")
+    if not len(manifest) and sink.index.describe_index_stats().total_vector_count:
+        # Vectors from before incremental ingestion have random IDs we can't diff against
+        print("Index has untracked vectors; clearing it for a full re-ingest")
+        sink.reset()
+
+    print("Syncing Pinecone index with dish data...")
+    stats = run_ingest(sink, manifest, embeddings)
+    if stats is not None:
+        print("✅ Pinecone index is up to date!")
+    return stats
+
+def setup_local_index(path=LOCAL_INDEX_DIR):
+    """Build or update the in-process vector index used when VECTOR_BACKEND=local"""
+    embeddings = CachedEmbeddings(HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2"))
+
+    # The manifest lives next to the index so deleting the directory forces a rebuild
+    sink = LocalIndexSink(path, model_name=embeddings.model_name)
+    manifest = IngestManifest(os.path.join(path, "manifest.db"), target="local")
+
+    print(f"Syncing local index at {path}...")
+    stats = run_ingest(sink, manifest, embeddings)
+    if stats is not None:
+        print("✅ Local index is up to date!")
+    return stats
 
 if __name__ == "__main__":
     # Run this script once to set up your index
-    setup_pinecone_index()
\ No newline at end of file
+    if VECTOR_BACKEND == "local":
+        setup_local_index()
+    else:
+        setup_pinecone_index()